@@ -1,29 +1,31 @@
 from datetime import datetime, timedelta
 from typing import Union
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from app.database import AsyncSessionLocal, get_db
 from app.models import User
+from app.cache import user_cache
+from app.passwords import (  # noqa: F401  (re-exported for callers of app.auth)
+    hash_password,
+    hash_password_async,
+    pwd_context,
+    verify_password,
+    verify_password_async,
+)
 
 # --- CONFIGURATION ---
 SECRET_KEY = "supersecretkey"  # Change this in production!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 # --- UTILITY FUNCTIONS ---
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def hash_password(password):
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -35,8 +37,18 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# --- THE MISSING FUNCTION ---
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Columns kept in the user cache. The password hash is left out on purpose;
+# it is only needed by login, which never goes through get_current_user.
+CACHED_USER_FIELDS = [attr.key for attr in inspect(User).column_attrs if attr.key != "password"]
+
+async def _user_from_cache(db: AsyncSession, values: dict):
+    # Rebuild the row as a detached instance and attach it to this request's
+    # session without a SELECT, so endpoints can still modify and commit it.
+    user = User(**values)
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
+
+async def user_for_token(token: str, db: AsyncSession):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -49,8 +61,25 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
-    user = db.query(User).filter(User.email == email).first()
+
+    cached = user_cache.get(email)
+    if cached is not None:
+        return await _user_from_cache(db, cached)
+
+    generation = user_cache.generation
+    user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    user_cache.set(email, {key: getattr(user, key) for key in CACHED_USER_FIELDS}, generation=generation)
+    return user
+
+# --- THE MISSING FUNCTION ---
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    return await user_for_token(token, db)
+
+async def get_stream_user(token: str = Query(...)):
+    # EventSource cannot send an Authorization header, so long-lived streams
+    # take the token as a query parameter. The session is closed before the
+    # stream starts so an open connection never holds a pooled DB connection.
+    async with AsyncSessionLocal() as db:
+        return await user_for_token(token, db)
@@ -0,0 +1,191 @@
+import heapq
+from collections import defaultdict
+from datetime import date
+
+from .matching import (
+    BLOOD_COMPATIBILITY, MATCH_FIELDS, RECIPIENT_COMPATIBILITY, donor_index, match_score, normalize_city,
+)
+
+# --- BATCH MATCHING ---
+# Assigns donors to every open request at once, so the same donor is never
+# suggested to two requests, and as many requests as possible are served:
+# first as many critical ones as possible, then, without giving any of those
+# up, as many high ones, then normal ones. Within a tier and a request class
+# the oldest requests are served first.
+#
+# Donors are grouped into (city, blood group) buckets and, within a bucket,
+# are interchangeable for compatibility, and compatibility never crosses a
+# city. So each city is a small flow network: source -> request class
+# (urgency tier, recipient group; capacity = its requests) -> compatible
+# donor bucket -> sink (capacity = the bucket's donors). Tiers are added one
+# at a time, most urgent first, and augmented to a maximum flow; augmenting
+# paths can reroute earlier tiers between buckets but never drop them. Edges
+# are tried narrowest donor group first, so an A+ request takes an A+ donor
+# before an O- one when both would do. The best-scored donors of each bucket
+# go to the most urgent of its takers.
+#
+# There is no request x donor compatibility matrix, bitmask or otherwise:
+# at 10k requests and 1M donors it would hold 10^10 cells, while the
+# buckets reduce compatibility to the 8 x 8 group table above. The work is
+# a sort of the requests, one small flow per city and one top-k per bucket,
+# all in plain Python, so the solver needs no NumPy.
+
+BLOOD_GROUPS = tuple(BLOOD_COMPATIBILITY)
+# How many recipient groups each donor group can give to.
+VERSATILITY = {group: len(targets) for group, targets in BLOOD_COMPATIBILITY.items()}
+URGENCY_RANK = {"critical": 2, "high": 1, "normal": 0}
+
+
+def _preferred_groups(recipient_group):
+    """Donor groups that can give to `recipient_group`, narrowest first; the exact group wins ties."""
+    return sorted(
+        RECIPIENT_COMPATIBILITY.get(recipient_group, ()),
+        key=lambda donor: (VERSATILITY[donor], donor != recipient_group),
+    )
+
+
+class _FlowNetwork:
+    def __init__(self):
+        self.graph = [[], []]   # node -> edge ids; node 0 is the source, 1 the sink
+        self.to, self.cap = [], []
+
+    def add_node(self):
+        self.graph.append([])
+        return len(self.graph) - 1
+
+    def add_edge(self, u, v, capacity):
+        edge = len(self.to)
+        self.to += [v, u]
+        self.cap += [capacity, 0]
+        self.graph[u].append(edge)
+        self.graph[v].append(edge + 1)
+        return edge
+
+    def flow(self, edge):
+        return self.cap[edge ^ 1]
+
+    def augment(self):
+        """Push flow along shortest paths until the sink is unreachable (Edmonds-Karp)."""
+        while True:
+            came_by = {0: None}
+            frontier = [0]
+            while frontier and 1 not in came_by:
+                following = []
+                for u in frontier:
+                    for edge in self.graph[u]:
+                        v = self.to[edge]
+                        if self.cap[edge] and v not in came_by:
+                            came_by[v] = edge
+                            following.append(v)
+                frontier = following
+            if 1 not in came_by:
+                return
+            path, node = [], 1
+            while came_by[node] is not None:
+                edge = came_by[node]
+                path.append(edge)
+                node = self.to[edge ^ 1]
+            pushed = min(self.cap[edge] for edge in path)
+            for edge in path:
+                self.cap[edge] -= pushed
+                self.cap[edge ^ 1] += pushed
+
+
+def _solve_city(tiers, bucket_sizes):
+    """Max-flow for one city.
+
+    `tiers` lists, most urgent first, {recipient group: request count};
+    `bucket_sizes` maps donor group to eligible donors. Returns
+    {(tier index, recipient group): [(donor group, count), ...]}.
+    """
+    network = _FlowNetwork()
+    bucket_node = {}
+    for group, size in bucket_sizes.items():
+        bucket_node[group] = network.add_node()
+        network.add_edge(bucket_node[group], 1, size)
+
+    class_edges = {}
+    for t, counts in enumerate(tiers):
+        for recipient_group, count in counts.items():
+            edges = []
+            node = network.add_node()
+            network.add_edge(0, node, count)
+            for donor_group in _preferred_groups(recipient_group):
+                if donor_group in bucket_node:
+                    edges.append((donor_group, network.add_edge(node, bucket_node[donor_group], count)))
+            class_edges[t, recipient_group] = edges
+        network.augment()
+
+    return {
+        key: [(donor_group, network.flow(edge)) for donor_group, edge in edges if network.flow(edge)]
+        for key, edges in class_edges.items()
+    }
+
+
+def solve(requests, buckets, today=None):
+    """Assign donors to requests.
+
+    `requests` are (id, blood_group, city, urgency, created_at) rows and
+    `buckets` maps (normalized city, blood group) to eligible index entries.
+    Returns (assignments, unassigned_ids); assignments are in priority order.
+    """
+    today = today or date.today()
+    if not requests:
+        return [], []
+
+    urgency = [URGENCY_RANK.get(r[3], 0) for r in requests]
+    # Most urgent first, then oldest (undated first), then lowest id.
+    order = sorted(
+        range(len(requests)),
+        key=lambda i: (-urgency[i], requests[i][4].toordinal() if requests[i][4] else 0, requests[i][0]),
+    )
+    tiers = sorted(set(URGENCY_RANK.values()), reverse=True)
+    tier_of = {rank: t for t, rank in enumerate(tiers)}
+
+    # city -> tier -> recipient group -> request indices in priority order
+    waiting = defaultdict(lambda: [defaultdict(list) for _ in tiers])
+    for i in order:
+        group = requests[i][1]
+        if group in RECIPIENT_COMPATIBILITY:
+            waiting[normalize_city(requests[i][2])][tier_of[urgency[i]]][group].append(i)
+
+    takers = defaultdict(list)   # (city, donor group) -> request indices
+    for city, city_tiers in waiting.items():
+        sizes = {group: len(buckets.get((city, group), ())) for group in BLOOD_GROUPS}
+        sizes = {group: size for group, size in sizes.items() if size}
+        if not sizes:
+            continue
+        flows = _solve_city([{g: len(ix) for g, ix in tier.items()} for tier in city_tiers], sizes)
+        for (t, recipient_group), parts in flows.items():
+            members = iter(city_tiers[t][recipient_group])
+            for donor_group, count in parts:
+                takers[city, donor_group].extend(next(members) for _ in range(count))
+
+    # Within a bucket the best-scored donors go to the most urgent takers.
+    rank = {i: position for position, i in enumerate(order)}
+    donor_for = {}
+    for key, members in takers.items():
+        members.sort(key=rank.__getitem__)
+        best = heapq.nlargest(
+            len(members), buckets[key],
+            key=lambda entry: match_score(entry, entry["blood_group"], today),
+        )
+        donor_for.update(zip(members, best))
+
+    assignments, unassigned = [], []
+    for i in order:
+        entry = donor_for.get(i)
+        if entry is None:
+            unassigned.append(requests[i][0])
+            continue
+        assignments.append({
+            "request_id": requests[i][0],
+            "urgency": requests[i][3],
+            "donor": {field: entry[field] for field in MATCH_FIELDS},
+        })
+    return assignments, unassigned
+
+
+def match_open_requests(requests):
+    """Solve against the current donor index; runs off the event loop."""
+    return solve(requests, donor_index.eligible_buckets())
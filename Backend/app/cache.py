@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# --- PROCESS-LEVEL CACHES ---
+# Small thread-safe LRU caches with a per-entry TTL. They live in the worker
+# process, so every write path that changes cached data must invalidate the
+# matching cache (see invalidate_dashboard below).
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        # Bumped on every pop()/clear(); a value computed before one is stale.
+        self.generation = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self.generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+
+
+# --- DASHBOARD ---
+# /stats/dashboard is the same for every user, so it is cached under one key.
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+dashboard_cache = TTLCache(maxsize=1, ttl=DASHBOARD_CACHE_TTL)
+
+
+def invalidate_dashboard():
+    dashboard_cache.clear()
+
+
+# --- AUTHENTICATED USERS ---
+# get_current_user caches the column values of the User row by token
+# subject (email), so authenticated requests skip the lookup query.
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def invalidate_user(email: str):
+    user_cache.pop(email)
+
+
+# --- TABLE VERSIONS ---
+# One counter per table, bumped by every write path that changes it. ETags
+# (app/etags.py) are built from them, so a conditional GET on an unchanged
+# table is answered with 304 without touching the database. Like the caches
+# above they count writes seen by this process only; app/etags.py bounds
+# the lifetime of ETags built from them for that reason.
+class TableVersions:
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def bump(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def get(self, *tables):
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+
+table_versions = TableVersions()
+
+
+def bump_tables(*tables):
+    table_versions.bump(*tables)
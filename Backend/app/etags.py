@@ -0,0 +1,50 @@
+import hashlib
+import os
+import time
+import uuid
+
+from fastapi import Request, Response
+
+from .cache import table_versions
+
+# --- CONDITIONAL GET ---
+# A strong ETag per (path, query string, versions of the tables the response
+# reads). Clients resend it in If-None-Match and get an empty 304 while none
+# of those tables has been written, without the endpoint running a query.
+# BOOT_ID ties ETags to this process, whose table counters start at zero.
+# The counters only see this process's writes, so with several workers a
+# write on one would never change another's ETags. Every ETag therefore also
+# carries the current ETAG_TTL_SECONDS window: a validator is honoured for at
+# most that long, which bounds how stale a 304 from another worker can be.
+
+BOOT_ID = uuid.uuid4().hex
+ETAG_TTL_SECONDS = float(os.getenv("ETAG_TTL_SECONDS", "10"))
+# Let clients store responses but always revalidate them.
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(request: Request, tables, *extra):
+    # Read the versions before querying: a write that lands mid-query then
+    # changes the next ETag, so the response is never cached as newer than it is.
+    versions = table_versions.get(*tables)
+    query = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    window = int(time.time() // ETAG_TTL_SECONDS)
+    key = f"{BOOT_ID}|{window}|{request.url.path}?{query}|{versions}|{extra}"
+    return '"' + hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + '"'
+
+
+def not_modified(request: Request, etag: str):
+    """A 304 response if If-None-Match matches `etag`, else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = {tag.strip() for tag in header.split(",")}
+    tags = {tag[2:] if tag.startswith("W/") else tag for tag in tags}
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
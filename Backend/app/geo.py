@@ -0,0 +1,48 @@
+import math
+from typing import Optional, Tuple
+
+# --- CITY COORDINATES ---
+# Local lookup table used when a donor or request gives a city but no
+# coordinates. Keys are normalized (lower-case) city names.
+CITY_COORDINATES = {
+    "lahore": (31.5204, 74.3587),
+    "karachi": (24.8607, 67.0011),
+    "islamabad": (33.6844, 73.0479),
+    "rawalpindi": (33.5651, 73.0169),
+    "peshawar": (34.0151, 71.5249),
+    "quetta": (30.1798, 66.9750),
+    "multan": (30.1575, 71.5249),
+    "faisalabad": (31.4504, 73.1350),
+    "gujranwala": (32.1877, 74.1945),
+    "sialkot": (32.4945, 74.5229),
+    "hyderabad": (25.3960, 68.3578),
+    "sargodha": (32.0740, 72.6861),
+    "bahawalpur": (29.3544, 71.6911),
+    "sukkur": (27.7052, 68.8574),
+    "abbottabad": (34.1688, 73.2215),
+    "sheikhupura": (31.7167, 73.9850),
+    "gujrat": (32.5736, 74.0790),
+    "kasur": (31.1187, 74.4507),
+    "mardan": (34.1989, 72.0231),
+    "larkana": (27.5570, 68.2264),
+}
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+
+def city_coordinates(city: Optional[str]) -> Optional[Tuple[float, float]]:
+    return CITY_COORDINATES.get((city or "").strip().lower())
+
+
+def resolve_coordinates(city, latitude=None, longitude=None):
+    """Explicit coordinates win; otherwise fall back to the city table (or None, None)."""
+    if latitude is not None and longitude is not None:
+        return float(latitude), float(longitude)
+    return city_coordinates(city) or (None, None)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
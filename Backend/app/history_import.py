@@ -0,0 +1,207 @@
+import csv
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Literal
+
+import orjson
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import Date, Integer, func, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .match_worker import drop_donor_matches
+from .matching import (
+    BLOOD_COMPATIBILITY, DONATION_DEFERRAL_DAYS, RESPONSIVENESS_WINDOW_DAYS, db_clock, touch_donors,
+)
+from .models import DonationHistory, DonorProfile, User
+from .stock import add_entry, apply_stock_deltas, stock_deltas
+
+# --- BULK HISTORY IMPORT ---
+# POST /history/batch reads a CSV (header row first) or NDJSON body as it
+# streams in, validates each row, and loads valid rows with COPY in chunks of
+# IMPORT_CHUNK_ROWS, all inside the request's transaction. Donors are named
+# by email and resolved with one query per chunk. Invalid rows are reported
+# back (the first MAX_REPORTED_ERRORS of them) and skipped; they never abort
+# the import. Units are added to blood_stock_rollup in the same transaction.
+# CSV fields may be quoted but must not contain line breaks.
+# Only users with a role in IMPORT_ROLES may import rows for other donors;
+# anyone else's rows must name their own email.
+
+IMPORT_CHUNK_ROWS = 5000
+MAX_REPORTED_ERRORS = 1000
+HISTORY_COPY_COLUMNS = ["user_id", "entry_type", "date", "hospital", "blood_group", "quantity"]
+# Roles are assigned by operators in the database; signup only offers donor and recipient.
+IMPORT_ROLES = {"admin", "hospital"}
+
+
+class HistoryImportRow(BaseModel):
+    email: str
+    hospital: str
+    blood_group: str
+    date: date
+    units: int = Field(1, ge=1)
+    entry_type: Literal["donation", "received"] = "donation"
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []
+        # Latest donation per donor and donations inside the responsiveness window.
+        self.latest_donation = {}
+        self.recent_donations = defaultdict(int)
+        self.stock = stock_deltas()
+
+    def reject(self, row_number, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+
+async def _lines(stream):
+    pending = b""
+    async for chunk in stream:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+async def parse_rows(stream, format: str):
+    """Yield (row_number, dict or error message) for each non-blank data line."""
+    header = None
+    row_number = 0
+    first = True
+    async for raw in _lines(stream):
+        try:
+            line = raw.decode("utf-8").rstrip("\r")
+        except UnicodeDecodeError:
+            line = None
+        if first and line:
+            line = line.lstrip("\ufeff")
+        first = False
+        if line is not None and not line.strip():
+            continue
+        if format == "csv" and header is None:
+            header = [name.strip().lower() for name in next(csv.reader([line or ""]))]
+            continue
+
+        row_number += 1
+        if line is None:
+            yield row_number, "not valid UTF-8"
+        elif format == "csv":
+            values = next(csv.reader([line]))
+            if len(values) != len(header):
+                yield row_number, f"expected {len(header)} fields, got {len(values)}"
+            else:
+                yield row_number, dict(zip(header, values))
+        else:
+            try:
+                value = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                yield row_number, "not valid JSON"
+                continue
+            yield row_number, value if isinstance(value, dict) else "expected a JSON object"
+
+
+def validate_row(value):
+    """A HistoryImportRow, or an error message."""
+    if isinstance(value, str):
+        return value
+    # Empty CSV cells mean "use the default".
+    value = {key: item for key, item in value.items() if item not in ("", None)}
+    try:
+        row = HistoryImportRow.model_validate(value)
+    except ValidationError as exc:
+        return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in exc.errors())
+    if row.blood_group not in BLOOD_COMPATIBILITY:
+        return f"blood_group: unknown blood group {row.blood_group!r}"
+    return row
+
+
+async def _copy_chunk(db: AsyncSession, chunk, report: ImportReport, own_email):
+    if own_email is not None:
+        for row_number, row in chunk:
+            if row.email != own_email:
+                report.reject(row_number, "email: you can only import your own history")
+        chunk = [(row_number, row) for row_number, row in chunk if row.email == own_email]
+        if not chunk:
+            return
+    emails = {row.email for _, row in chunk}
+    user_ids = dict((await db.execute(select(User.email, User.id).where(User.email.in_(emails)))).all())
+
+    records = []
+    window_start = date.today() - timedelta(days=RESPONSIVENESS_WINDOW_DAYS)
+    for row_number, row in chunk:
+        user_id = user_ids.get(row.email)
+        if user_id is None:
+            report.reject(row_number, f"email: no user with email {row.email!r}")
+            continue
+        records.append((user_id, row.entry_type, row.date, row.hospital, row.blood_group, row.units))
+        add_entry(report.stock, row.date, row.blood_group, row.hospital, row.entry_type, row.units)
+        if row.entry_type == "donation":
+            if row.date > report.latest_donation.get(user_id, date.min):
+                report.latest_donation[user_id] = row.date
+            if row.date >= window_start:
+                report.recent_donations[user_id] += 1
+
+    if records:
+        # The lookup above has opened the session's transaction on this
+        # connection, so COPY joins it and rolls back with it.
+        conn = await db.connection()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            DonationHistory.__tablename__, records=records, columns=HISTORY_COPY_COLUMNS,
+        )
+        report.inserted += len(records)
+
+
+async def _advance_eligibility(db: AsyncSession, latest_donation):
+    """Move donation dates forward for donors whose imported donation is newer; returns the updated profiles."""
+    if not latest_donation:
+        return []
+    latest = select(
+        func.unnest(literal(list(latest_donation.keys()), ARRAY(Integer))).label("user_id"),
+        func.unnest(literal(list(latest_donation.values()), ARRAY(Date))).label("date"),
+    ).subquery()
+    stmt = (
+        update(DonorProfile)
+        .where(
+            DonorProfile.user_id == latest.c.user_id,
+            or_(DonorProfile.last_donation_date.is_(None), DonorProfile.last_donation_date < latest.c.date),
+        )
+        .values(last_donation_date=latest.c.date, next_eligible_date=latest.c.date + DONATION_DEFERRAL_DAYS,
+                updated_at=db_clock())
+        .returning(DonorProfile)
+        .execution_options(synchronize_session=False)
+    )
+    return (await db.execute(stmt)).scalars().all()
+
+
+async def import_history(db: AsyncSession, stream, format: str, caller):
+    # None lets rows name any donor.
+    own_email = None if caller.role in IMPORT_ROLES else caller.email
+    report = ImportReport()
+    chunk = []
+    async for row_number, value in parse_rows(stream, format):
+        row = validate_row(value)
+        if isinstance(row, str):
+            report.reject(row_number, row)
+            continue
+        chunk.append((row_number, row))
+        if len(chunk) >= IMPORT_CHUNK_ROWS:
+            await _copy_chunk(db, chunk, report, own_email)
+            chunk = []
+    if chunk:
+        await _copy_chunk(db, chunk, report, own_email)
+
+    profiles = await _advance_eligibility(db, report.latest_donation)
+    await drop_donor_matches(db, [profile.id for profile in profiles])
+    if report.recent_donations:
+        await db.execute(touch_donors(report.recent_donations.keys()))
+    await apply_stock_deltas(db, report.stock)
+    await db.commit()
+    return report, profiles
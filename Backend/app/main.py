@@ -1,9 +1,63 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 # Import all your routers
-from app.routers import auth_routes, recipient, donor, stats, history
+from app.routers import auth_routes, recipient, donor, stats, history, internal
+from app.database import AsyncSessionLocal, dispose_engines, get_async_engine, get_engine
+from app.match_worker import start_match_workers, stop_match_workers
+from app.matching import load_donor_index
+from app.migrations import migrate
+from app.passwords import shutdown_password_pool
+from app.pool_metrics import POOL_LOG_INTERVAL, log_pool_periodically
+from app.profiling import DEBUG, add_stats_headers, install_query_counter, start_request_stats
+from app.ratelimit import (
+    ADMISSION_CONTROL_ENABLED, RATE_LIMIT_ENABLED, AdmissionControlMiddleware, RateLimitMiddleware,
+)
+
+# Schema changes are normally applied with `python migrate.py` before the
+# server starts; MIGRATE_ON_STARTUP=1 runs them from the lifespan instead.
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "").lower() in ("1", "true", "yes")
+
+# --- LIFESPAN ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DEBUG:
+        install_query_counter(get_async_engine().sync_engine)
+    if MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate, get_engine())
+
+    # Matching reads donors from memory; load them once per worker process.
+    # The match sweep below then syncs other workers' donor writes into it.
+    async with AsyncSessionLocal() as db:
+        await load_donor_index(db)
+    # Background refresh of request_matches; it scores from the index above.
+    match_workers = start_match_workers()
+
+    pool_logger = None
+    if POOL_LOG_INTERVAL > 0:
+        pool_logger = asyncio.create_task(log_pool_periodically(get_async_engine().pool))
+
+    yield
 
-app = FastAPI(title="Blood Donation System API")
+    await stop_match_workers(match_workers)
+    if pool_logger is not None:
+        pool_logger.cancel()
+    shutdown_password_pool()
+    await dispose_engines()
+
+app = FastAPI(title="Blood Donation System API", lifespan=lifespan)
+
+# --- RATE LIMITING AND ADMISSION CONTROL ---
+# Added before CORS so they run inside it and their 429/503 responses carry
+# CORS headers. Admission control is outermost: an overloaded server refuses
+# work before spending anything on it. See app/ratelimit.py.
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+if ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
 
 # --- CORS CONFIGURATION ---
 # IMPORTANT: This list must contain the exact domains of your frontend applications.
@@ -27,14 +81,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],         # Allow ALL methods (GET, POST, PUT, DELETE)
     allow_headers=["*"],         # Allow ALL headers (Authorization, Content-Type, etc.)
+    # Keyset pagination cursor, conditional-GET validator for the list
+    # endpoints, and the back-off hint on 429/503
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 )
 
+# --- COMPRESSION ---
+# Bodies over GZIP_MIN_SIZE bytes are gzipped for clients that accept it.
+# Server-Sent Event streams are skipped: gzip would buffer the events.
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1000"))
+UNCOMPRESSED_PATHS = {"/donor/stream"}
+
+class CompressionMiddleware(GZipMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in UNCOMPRESSED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(CompressionMiddleware, minimum_size=GZIP_MIN_SIZE)
+
+# --- DEBUG: SQL QUERY COUNTER ---
+if DEBUG:
+    @app.middleware("http")
+    async def count_queries(request: Request, call_next):
+        stats = start_request_stats()
+        response = await call_next(request)
+        add_stats_headers(response, stats)
+        return response
+
 # --- REGISTER ROUTERS ---
 app.include_router(auth_routes.router, prefix="/auth", tags=["auth"])
 app.include_router(recipient.router, prefix="/recipient", tags=["recipients"])
 app.include_router(donor.router, prefix="/donor", tags=["donors"])
 app.include_router(stats.router, prefix="/stats", tags=["stats"])
 app.include_router(history.router, prefix="/history", tags=["history"])
+app.include_router(internal.router, prefix="/internal", tags=["internal"])
 
 @app.get("/")
 def root():
@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import math
+import os
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Integer, and_, any_, delete, func, literal, or_, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+
+from .database import UPSERT_BATCH_ROWS, AsyncSessionLocal
+from .geo import KM_PER_DEGREE, haversine_km
+from .matching import (
+    BLOOD_COMPATIBILITY, DEFAULT_MATCH_RADIUS_KM, RECIPIENT_COMPATIBILITY, compatible_sql, donor_index,
+    donor_rows_query, index_entry, is_eligible, match_score, normalize_city, sync_donor_index,
+)
+from .models import DonorProfile, RecipientRequest, RequestMatch
+
+logger = logging.getLogger("app.match_worker")
+
+# --- MATERIALIZED MATCHES ---
+# request_matches holds the MATCHES_PER_REQUEST best donors of every open
+# request, scored as GET /recipient/matches/{id} scores them with the
+# default radius, so that endpoint is one indexed read.
+#
+# Invalidation is part of each write's transaction, so it survives crashes
+# and is seen by every worker process:
+# - a change to how a donor matches (group, city, coordinates, eligibility)
+#   deletes the donor's rows, clears matched_at on the requests that held
+#   them and sets donor_profiles.matches_stale (drop_donor_matches);
+# - a new request starts with matched_at NULL; fulfilling clears it.
+# The read also re-checks eligibility, compatibility and city against the
+# current donor row (valid_match), and serves rows only while matched_at is
+# set and younger than MATCH_MAX_AGE; otherwise it ranks from the index.
+#
+# Refilling is asynchronous. MATCH_WORKERS tasks take jobs from an
+# in-process queue, fed right after each write and, as a safety net for lost
+# or failed jobs, by a sweep every MATCH_SWEEP_SECONDS over the durable
+# markers. The sweep first brings this process's donor index up to date
+# with the other workers' writes (app/matching.py, CROSS-WORKER SYNC), so
+# it trails them by at most MATCH_SWEEP_SECONDS. Jobs:
+# - ("request", id) ranks one request from this process's donor index,
+#   rescores those donors from their current rows, upserts them and trims
+#   back to the cap (fulfilled requests only lose their rows);
+# - ("donor", donor_id) rescores one stale donor, read from the database,
+#   against the open requests it can give to and trims each touched request
+#   back to the cap.
+
+MATCHES_PER_REQUEST = 50
+MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", "2"))
+# Scores drift as days pass (rest, eligibility), so rows are refreshed daily.
+MATCH_MAX_AGE = timedelta(hours=float(os.getenv("MATCH_MAX_AGE_HOURS", "24")))
+MATCH_SWEEP_SECONDS = float(os.getenv("MATCH_SWEEP_SECONDS", "60"))
+
+TRIM_SQL = text("""
+    DELETE FROM request_matches rm
+    USING (
+        SELECT request_id, donor_id,
+               row_number() OVER (PARTITION BY request_id ORDER BY score DESC, donor_id DESC) AS rank
+        FROM request_matches
+        WHERE request_id = ANY(:request_ids)
+    ) ranked
+    WHERE rm.request_id = ranked.request_id AND rm.donor_id = ranked.donor_id AND ranked.rank > :cap
+""")
+
+_queue = asyncio.Queue()
+_pending = set()
+
+
+def enqueue(kind: str, key: int):
+    """Queue a "request" (request id) or "donor" (donor profile id) job unless it is already waiting."""
+    job = (kind, key)
+    if job in _pending:
+        return
+    _pending.add(job)
+    _queue.put_nowait(job)
+
+
+def _ids(ids):
+    # One array parameter, however many ids an import touches.
+    return any_(literal(list(ids), ARRAY(Integer)))
+
+
+async def drop_donor_matches(db, donor_ids):
+    """Invalidate donors' matches inside the caller's write transaction."""
+    if not donor_ids:
+        return
+    # Flag first: the row lock waits out a running refresh_donor, so the
+    # delete below also removes the rows it wrote.
+    await db.execute(
+        update(DonorProfile).where(DonorProfile.id == _ids(donor_ids)).values(matches_stale=True)
+        .execution_options(synchronize_session=False)
+    )
+    dropped = set((await db.execute(
+        delete(RequestMatch).where(RequestMatch.donor_id == _ids(donor_ids)).returning(RequestMatch.request_id)
+    )).scalars())
+    if dropped:
+        # Those requests are ranked live until a refresh refills them.
+        await db.execute(
+            update(RecipientRequest).where(RecipientRequest.id == _ids(dropped)).values(matched_at=None)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def valid_match(today):
+    """Join condition re-checking a stored row against the current donor and request."""
+    compatible = compatible_sql(RecipientRequest.blood_group, DonorProfile.blood_group)
+    same_place = or_(
+        and_(RecipientRequest.latitude.is_not(None), RecipientRequest.longitude.is_not(None)),
+        func.lower(func.trim(DonorProfile.city)) == func.lower(func.trim(RecipientRequest.city)),
+    )
+    eligible = or_(DonorProfile.next_eligible_date.is_(None), DonorProfile.next_eligible_date <= today)
+    return and_(RequestMatch.request_id == RecipientRequest.id, compatible, same_place, eligible)
+
+
+def is_fresh(matched_at, now=None):
+    return matched_at is not None and (now or datetime.now()) - matched_at < MATCH_MAX_AGE
+
+
+def rank_request(blood_group, city, latitude, longitude, limit=MATCHES_PER_REQUEST):
+    """The request's top donors from the index, as GET /recipient/matches/{id} ranks them."""
+    if latitude is not None and longitude is not None:
+        return donor_index.nearest(blood_group, latitude, longitude, limit, DEFAULT_MATCH_RADIUS_KM)
+    return donor_index.match(blood_group, city, limit)
+
+
+async def _upsert_matches(db, rows):
+    for start in range(0, len(rows), UPSERT_BATCH_ROWS):
+        stmt = insert(RequestMatch).values(rows[start:start + UPSERT_BATCH_ROWS])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[RequestMatch.request_id, RequestMatch.donor_id],
+            set_={"score": stmt.excluded.score, "distance_km": stmt.excluded.distance_km},
+        ))
+
+
+async def refresh_request(request_id: int):
+    today = date.today()
+    async with AsyncSessionLocal() as db:
+        request = (await db.execute(
+            select(RecipientRequest.id, RecipientRequest.blood_group, RecipientRequest.city,
+                   RecipientRequest.latitude, RecipientRequest.longitude, RecipientRequest.fulfilled)
+            .where(RecipientRequest.id == request_id)
+        )).one_or_none()
+        # Fulfilled requests only lose their rows, and matched_at is cleared so
+        # the endpoint ranks them from the index instead.
+        if request is None or request.fulfilled:
+            await db.execute(delete(RequestMatch).where(RequestMatch.request_id == request_id))
+            await db.execute(
+                update(RecipientRequest).where(RecipientRequest.id == request_id).values(matched_at=None)
+            )
+        else:
+            matches = rank_request(request.blood_group, request.city, request.latitude, request.longitude)
+            rows = await _rescore(db, request, [m["id"] for m in matches], today)
+            await _upsert_matches(db, rows)
+            # Existing rows are kept, not replaced: this process's index may
+            # miss a donor that another worker process has since added.
+            await db.execute(TRIM_SQL, {"request_ids": [request_id], "cap": MATCHES_PER_REQUEST})
+            await db.execute(
+                update(RecipientRequest).where(RecipientRequest.id == request_id).values(matched_at=datetime.now())
+            )
+        await db.commit()
+
+
+async def _rescore(db, request, donor_ids, today):
+    """Score the index's picks from their current rows, as another worker process may have changed them."""
+    if not donor_ids:
+        return []
+    donors = (await db.execute(
+        # Stale donors are left to their own job.
+        donor_rows_query(today).where(DonorProfile.id.in_(donor_ids), DonorProfile.matches_stale == False)
+    )).all()
+    compatible = RECIPIENT_COMPATIBILITY.get(request.blood_group, ())
+    has_coordinates = request.latitude is not None and request.longitude is not None
+    rows = []
+    for donor in donors:
+        entry = index_entry(donor)
+        if entry["blood_group"] not in compatible or not is_eligible(entry["next_eligible_date"], today):
+            continue
+        if has_coordinates and (entry["latitude"] is None or entry["longitude"] is None):
+            continue
+        if not has_coordinates and normalize_city(entry["city"]) != normalize_city(request.city):
+            continue
+        rows.extend(_score_donor(entry, [request], today))
+    return rows
+
+
+def _candidate_requests(entry):
+    """Open requests the donor could be matched to: same city, or inside the radius box around the donor."""
+    targets = BLOOD_COMPATIBILITY.get(entry["blood_group"], ())
+    no_coordinates = or_(RecipientRequest.latitude.is_(None), RecipientRequest.longitude.is_(None))
+    place = and_(no_coordinates, func.lower(RecipientRequest.city) == normalize_city(entry["city"]))
+    if entry["latitude"] is not None and entry["longitude"] is not None:
+        dlat = DEFAULT_MATCH_RADIUS_KM / KM_PER_DEGREE
+        dlon = dlat / max(math.cos(math.radians(min(89.0, abs(entry["latitude"]) + dlat))), 0.01)
+        place = or_(place, and_(
+            RecipientRequest.latitude.between(entry["latitude"] - dlat, entry["latitude"] + dlat),
+            RecipientRequest.longitude.between(entry["longitude"] - dlon, entry["longitude"] + dlon),
+        ))
+    return (
+        select(RecipientRequest.id, RecipientRequest.blood_group, RecipientRequest.latitude,
+               RecipientRequest.longitude)
+        .where(RecipientRequest.fulfilled == False, RecipientRequest.blood_group.in_(targets), place)
+    )
+
+
+def _score_donor(entry, requests, today):
+    rows = []
+    for request in requests:
+        distance = None
+        if request.latitude is not None and request.longitude is not None:
+            distance = haversine_km(request.latitude, request.longitude, entry["latitude"], entry["longitude"])
+            if distance > DEFAULT_MATCH_RADIUS_KM:
+                continue
+        score = match_score(entry, request.blood_group, today, distance, DEFAULT_MATCH_RADIUS_KM)
+        rows.append({
+            "request_id": request.id, "donor_id": entry["id"], "score": round(score, 4),
+            "distance_km": round(distance, 2) if distance is not None else None,
+        })
+    return rows
+
+
+async def refresh_donor(donor_id: int):
+    today = date.today()
+    async with AsyncSessionLocal() as db:
+        # The row lock makes a concurrent drop_donor_matches wait for this job
+        # and then delete what it wrote, rather than race it.
+        row = (await db.execute(
+            donor_rows_query(today)
+            .where(DonorProfile.id == donor_id, DonorProfile.matches_stale == True)
+            .with_for_update(of=DonorProfile)
+        )).one_or_none()
+        if row is None:
+            return
+        entry = index_entry(row)
+        await db.execute(delete(RequestMatch).where(RequestMatch.donor_id == donor_id))
+        if is_eligible(entry["next_eligible_date"], today):
+            requests = (await db.execute(_candidate_requests(entry))).all()
+            rows = _score_donor(entry, requests, today)
+            await _upsert_matches(db, rows)
+            if rows:
+                await db.execute(TRIM_SQL, {"request_ids": [row["request_id"] for row in rows],
+                                            "cap": MATCHES_PER_REQUEST})
+        await db.execute(update(DonorProfile).where(DonorProfile.id == donor_id).values(matches_stale=False))
+        await db.commit()
+
+
+async def _work():
+    while True:
+        job = await _queue.get()
+        _pending.discard(job)
+        kind, key = job
+        try:
+            if kind == "request":
+                await refresh_request(key)
+            else:
+                await refresh_donor(key)
+        except Exception:
+            # The durable markers stay set, so the next sweep retries the job.
+            logger.exception("Match job %s %s failed", kind, key)
+        finally:
+            _queue.task_done()
+
+
+async def _sweep():
+    """Sync this process's donor index, then queue every open request without fresh rows and every stale donor."""
+    async with AsyncSessionLocal() as db:
+        # First, so the request jobs below rank from the other workers' writes too.
+        synced = await sync_donor_index(db)
+        request_ids = (await db.execute(
+            select(RecipientRequest.id).where(
+                RecipientRequest.fulfilled == False,
+                or_(RecipientRequest.matched_at.is_(None),
+                    RecipientRequest.matched_at < datetime.now() - MATCH_MAX_AGE),
+            )
+        )).scalars().all()
+        donor_ids = (await db.execute(
+            select(DonorProfile.id).where(DonorProfile.matches_stale == True)
+        )).scalars().all()
+    # Donors first: their jobs re-add them before requests are rescored.
+    for donor_id in donor_ids:
+        enqueue("donor", donor_id)
+    for request_id in request_ids:
+        enqueue("request", request_id)
+    return synced, len(request_ids), len(donor_ids)
+
+
+async def _sweep_periodically():
+    while True:
+        try:
+            synced, requests, donors = await _sweep()
+            if synced or requests or donors:
+                logger.info("Synced %d index donors; queued %d requests and %d donors for match refresh",
+                            synced, requests, donors)
+        except Exception:
+            logger.exception("Match sweep failed")
+        await asyncio.sleep(MATCH_SWEEP_SECONDS)
+
+
+def start_match_workers():
+    """Start the workers and the sweep; pass the result to stop_match_workers()."""
+    tasks = [asyncio.create_task(_work()) for _ in range(MATCH_WORKERS)]
+    tasks.append(asyncio.create_task(_sweep_periodically()))
+    return tasks
+
+
+async def stop_match_workers(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,5 +1,12 @@
-from .models import DonorProfile
-from typing import List
+import heapq
+import math
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from sqlalchemy import DateTime, Integer, and_, any_, cast, func, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from .geo import KM_PER_DEGREE, haversine_km
+from .models import DonationHistory, DonorProfile, User
 
 # Compatibility map
 BLOOD_COMPATIBILITY = {
@@ -13,10 +20,413 @@ BLOOD_COMPATIBILITY = {
     "O-": ["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"],
 }
 
-def find_matching_donors(donors: List[DonorProfile], requested_blood: str, city: str):
-    matches = []
-    for donor in donors:
-        if donor.eligibility and donor.city.lower() == city.lower():
-            if donor.blood_group in BLOOD_COMPATIBILITY and requested_blood in BLOOD_COMPATIBILITY[donor.blood_group]:
-                matches.append(donor)
-    return matches
+# Reverse map: recipient group -> donor groups that can give to it.
+# Precomputed once so a lookup never walks BLOOD_COMPATIBILITY per donor.
+RECIPIENT_COMPATIBILITY = {
+    recipient: tuple(donor for donor, targets in BLOOD_COMPATIBILITY.items() if recipient in targets)
+    for recipient in BLOOD_COMPATIBILITY
+}
+
+
+def compatible_sql(recipient_group, donor_group):
+    """SQL condition: donor_group can give to recipient_group (both column expressions)."""
+    return or_(*(
+        and_(recipient_group == recipient, donor_group.in_(donors))
+        for recipient, donors in RECIPIENT_COMPATIBILITY.items()
+    ))
+
+
+# Minimum interval between whole-blood donations.
+DONATION_DEFERRAL_DAYS = 90
+
+
+def next_eligible_date(last_donation_date):
+    if last_donation_date is None:
+        return None
+    return last_donation_date + timedelta(days=DONATION_DEFERRAL_DAYS)
+
+
+def is_eligible(next_eligible, today=None):
+    return next_eligible is None or next_eligible <= (today or date.today())
+
+
+def normalize_city(city: str) -> str:
+    return (city or "").strip().lower()
+
+
+# --- MATCH SCORING ---
+# A score in [0, 1]; higher is a better donor to contact first. It blends
+# - blood group: an exact match beats a compatible one, and among compatible
+#   donors the less versatile are preferred, so O- is kept for those who need it;
+# - rest: days since the last donation, saturating after a year;
+# - responsiveness: donations logged over the last RESPONSIVENESS_WINDOW_DAYS;
+# - proximity, when the search has a centre and radius.
+GROUP_WEIGHT = 0.45
+REST_WEIGHT = 0.25
+RESPONSIVENESS_WEIGHT = 0.2
+PROXIMITY_WEIGHT = 0.1
+RESPONSIVENESS_WINDOW_DAYS = 365
+RESPONSIVE_DONATIONS = 3    # this many recent donations counts as fully responsive
+
+
+def match_score(entry, requested_blood, today, distance_km=None, radius_km=None):
+    donor_group = entry["blood_group"]
+    if donor_group == requested_blood:
+        group = 1.0
+    else:
+        group = 1.0 - len(BLOOD_COMPATIBILITY.get(donor_group, ())) / len(BLOOD_COMPATIBILITY)
+
+    last = entry["last_donation_date"]
+    rest = 0.5 if last is None else min((today - last).days / 365.0, 1.0)
+
+    responsiveness = min(entry["recent_donations"] / RESPONSIVE_DONATIONS, 1.0)
+
+    proximity = 0.5
+    if distance_km is not None and radius_km:
+        proximity = 1.0 - min(distance_km / radius_km, 1.0)
+
+    return (GROUP_WEIGHT * group + REST_WEIGHT * rest
+            + RESPONSIVENESS_WEIGHT * responsiveness + PROXIMITY_WEIGHT * proximity)
+
+
+# --- IN-MEMORY MATCHING INDEX ---
+# Donors are bucketed twice:
+# - by (normalized city, donor blood group), for exact-city matches. A match
+#   for a recipient group reads at most len(RECIPIENT_COMPATIBILITY[group])
+#   buckets, so the cost is proportional to the result, not the donor table.
+# - by (grid cell, donor blood group), for nearest-donor search. Cells are
+#   GRID_CELL_DEG degrees square; a search walks rings of cells outwards and
+#   stops once no unvisited cell can hold a closer donor than the k-th best.
+# Donors still inside their deferral interval are skipped at lookup time,
+# and results are the top `limit` by match_score, picked with a heap, so the
+# response never grows with the number of compatible donors.
+# The index lives in the worker process: it is built at startup and every
+# write that changes a donor profile must call upsert(). Other worker
+# processes learn of the change through donor_profiles.updated_at (see
+# CROSS-WORKER SYNC below).
+
+MATCH_FIELDS = ("id", "name", "blood_group", "city", "last_donation_date")
+# Nearest-donor search ranks this many times `limit` of the closest donors.
+NEAREST_POOL_FACTOR = 5
+# Search radius for requests with coordinates.
+DEFAULT_MATCH_RADIUS_KM = 50.0
+GRID_CELL_DEG = 0.25   # ~28 km north-south
+
+
+def _grid_cell(latitude, longitude):
+    return math.floor(latitude / GRID_CELL_DEG), math.floor(longitude / GRID_CELL_DEG)
+
+
+def _ring(cy, cx, r):
+    if r == 0:
+        yield cy, cx
+        return
+    for x in range(cx - r, cx + r + 1):
+        yield cy - r, x
+        yield cy + r, x
+    for y in range(cy - r + 1, cy + r):
+        yield y, cx - r
+        yield y, cx + r
+
+
+class DonorIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = defaultdict(dict)   # (city, blood_group) -> {donor_id: entry}
+        self._keys = {}                     # donor_id -> (city, blood_group)
+        self._grid = defaultdict(dict)      # (cell_y, cell_x, blood_group) -> {donor_id: entry}
+        self._cells = {}                    # donor_id -> (cell_y, cell_x, blood_group)
+        self._by_user = {}                  # user_id -> donor_id
+        self.synced_at = None               # database time of the last load or sync
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _entry(donor_id, user_id, full_name, blood_group, city, last_donation_date,
+               latitude, longitude, next_eligible, recent_donations=0):
+        return {
+            "id": donor_id,
+            "user_id": user_id,
+            "name": full_name,
+            "blood_group": blood_group,
+            "city": city,
+            "last_donation_date": last_donation_date,
+            "latitude": latitude,
+            "longitude": longitude,
+            "next_eligible_date": next_eligible,
+            "recent_donations": recent_donations,
+        }
+
+    @staticmethod
+    def _move(buckets, keys, donor_id, key, entry):
+        old_key = keys.pop(donor_id, None)
+        if old_key is not None:
+            buckets[old_key].pop(donor_id, None)
+            if not buckets[old_key]:
+                del buckets[old_key]
+        if key is not None:
+            buckets[key][donor_id] = entry
+            keys[donor_id] = key
+
+    def _put(self, entry):
+        donor_id = entry["id"]
+        self._move(self._buckets, self._keys, donor_id,
+                   (normalize_city(entry["city"]), entry["blood_group"]), entry)
+        cell = None
+        if entry["latitude"] is not None and entry["longitude"] is not None:
+            cell = (*_grid_cell(entry["latitude"], entry["longitude"]), entry["blood_group"])
+        self._move(self._grid, self._cells, donor_id, cell, entry)
+        self._by_user[entry["user_id"]] = donor_id
+
+    def build(self, rows):
+        """Replace the index contents with rows shaped like INDEX_COLUMNS."""
+        with self._lock:
+            self._buckets.clear()
+            self._keys.clear()
+            self._grid.clear()
+            self._cells.clear()
+            self._by_user.clear()
+            for row in rows:
+                self._put(self._entry(*row))
+
+    def refresh(self, rows):
+        """Add or replace the donors in rows shaped like INDEX_COLUMNS plus the recent count."""
+        with self._lock:
+            for row in rows:
+                self._put(self._entry(*row))
+
+    def upsert(self, profile: DonorProfile, full_name: str = None):
+        """Add or replace the donor; full_name=None keeps the indexed name."""
+        with self._lock:
+            old_id = self._by_user.get(profile.user_id)
+            old = self._buckets[self._keys[old_id]][old_id] if old_id in self._keys else None
+            recent = old["recent_donations"] if old else 0
+            if full_name is None and old:
+                full_name = old["name"]
+            self._put(self._entry(
+                profile.id, profile.user_id, full_name,
+                profile.blood_group, profile.city, profile.last_donation_date,
+                profile.latitude, profile.longitude, profile.next_eligible_date, recent,
+            ))
+
+    def lookup(self, user_id: int):
+        with self._lock:
+            donor_id = self._by_user.get(user_id)
+            if donor_id is None:
+                return None
+            return dict(self._buckets[self._keys[donor_id]][donor_id])
+
+    def record_donation(self, user_id: int, donated_on: date):
+        if (date.today() - donated_on).days <= RESPONSIVENESS_WINDOW_DAYS:
+            self.add_recent_donations({user_id: 1})
+
+    def add_recent_donations(self, counts):
+        """counts maps user_id to new donations inside the responsiveness window."""
+        with self._lock:
+            for user_id, count in counts.items():
+                donor_id = self._by_user.get(user_id)
+                if donor_id is not None:
+                    self._buckets[self._keys[donor_id]][donor_id]["recent_donations"] += count
+
+    def rename(self, user_id: int, full_name: str):
+        with self._lock:
+            donor_id = self._by_user.get(user_id)
+            if donor_id is None:
+                return
+            self._buckets[self._keys[donor_id]][donor_id]["name"] = full_name
+
+    def match(self, requested_blood: str, city: str, limit: int):
+        """The `limit` best-scored eligible, compatible donors in the city."""
+        city_key = normalize_city(city)
+        today = date.today()
+        with self._lock:
+            candidates = (
+                entry
+                for donor_group in RECIPIENT_COMPATIBILITY.get(requested_blood, ())
+                for entry in self._buckets.get((city_key, donor_group), {}).values()
+                if is_eligible(entry["next_eligible_date"], today)
+            )
+            scored = ((match_score(entry, requested_blood, today), entry["id"], entry) for entry in candidates)
+            top = heapq.nlargest(limit, scored)
+            return [_project(entry, score) for score, _, entry in top]
+
+    def eligible_buckets(self, today=None):
+        """{(city, blood_group): [entry, ...]} of the donors eligible on `today`."""
+        today = today or date.today()
+        # Copied one bucket per lock hold, so writers and lookups on the event
+        # loop wait for one bucket at most, not for the whole index. Entries
+        # are replaced rather than edited by upsert(), so the copies stay whole.
+        with self._lock:
+            keys = list(self._buckets)
+        snapshot = {}
+        for key in keys:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                entries = list(bucket.values()) if bucket else []
+            snapshot[key] = [entry for entry in entries if is_eligible(entry["next_eligible_date"], today)]
+        return snapshot
+
+    def nearest(self, requested_blood: str, latitude: float, longitude: float, limit: int, radius_km: float):
+        """The `limit` best-scored donors among the closest compatible ones within radius_km."""
+        today = date.today()
+        pool = self._nearest_entries(requested_blood, latitude, longitude, limit * NEAREST_POOL_FACTOR, radius_km)
+        scored = (
+            (match_score(entry, requested_blood, today, distance, radius_km), entry["id"], distance, entry)
+            for distance, entry in pool
+        )
+        top = heapq.nlargest(limit, scored)
+        return [_project(entry, score, distance) for score, _, distance, entry in top]
+
+    def _nearest_entries(self, requested_blood, latitude, longitude, k, radius_km):
+        """(distance_km, entry) for the k closest eligible compatible donors within radius_km."""
+        groups = RECIPIENT_COMPATIBILITY.get(requested_blood, ())
+        cy, cx = _grid_cell(latitude, longitude)
+        # East-west cell width shrinks with latitude; use the narrowest one
+        # the search can reach so the stopping bound stays conservative.
+        widest_lat = min(89.0, abs(latitude) + radius_km / KM_PER_DEGREE)
+        cell_km = GRID_CELL_DEG * KM_PER_DEGREE * math.cos(math.radians(widest_lat))
+        max_ring = int(radius_km // cell_km) + 1
+
+        best = []   # max-heap of the k nearest so far: (-distance, donor_id, entry)
+        today = date.today()
+        with self._lock:
+            for r in range(max_ring + 1):
+                # Every cell in ring r is at least (r - 1) cells away.
+                if len(best) == k and (r - 1) * cell_km > -best[0][0]:
+                    break
+                for y, x in _ring(cy, cx, r):
+                    for group in groups:
+                        bucket = self._grid.get((y, x, group))
+                        if not bucket:
+                            continue
+                        for donor_id, entry in bucket.items():
+                            if not is_eligible(entry["next_eligible_date"], today):
+                                continue
+                            distance = haversine_km(latitude, longitude, entry["latitude"], entry["longitude"])
+                            if distance > radius_km:
+                                continue
+                            item = (-distance, donor_id, entry)
+                            if len(best) < k:
+                                heapq.heappush(best, item)
+                            elif item > best[0]:
+                                heapq.heapreplace(best, item)
+
+            return [(-neg_distance, dict(entry)) for neg_distance, _, entry in best]
+
+
+def _project(entry, score, distance_km=None):
+    match = {field: entry[field] for field in MATCH_FIELDS}
+    match["score"] = round(score, 4)
+    if distance_km is not None:
+        match["distance_km"] = round(distance_km, 2)
+    return match
+
+
+donor_index = DonorIndex()
+
+
+INDEX_COLUMNS = (
+    DonorProfile.id,
+    DonorProfile.user_id,
+    User.full_name,
+    DonorProfile.blood_group,
+    DonorProfile.city,
+    DonorProfile.last_donation_date,
+    DonorProfile.latitude,
+    DonorProfile.longitude,
+    DonorProfile.next_eligible_date,
+)
+
+
+def index_rows_query(today=None):
+    """Rows for DonorIndex.build(): INDEX_COLUMNS plus the recent donation count.
+
+    The counts come from one grouped pass over the window, which suits the
+    full startup scan; use donor_rows_query() for a few donors.
+    """
+    since = (today or date.today()) - timedelta(days=RESPONSIVENESS_WINDOW_DAYS)
+    recent = (
+        select(DonationHistory.user_id, func.count(DonationHistory.id).label("recent_donations"))
+        .where(DonationHistory.entry_type == "donation", DonationHistory.date >= since)
+        .group_by(DonationHistory.user_id)
+        .subquery()
+    )
+    return (
+        select(*INDEX_COLUMNS, func.coalesce(recent.c.recent_donations, 0))
+        .join(User, DonorProfile.user_id == User.id)
+        .outerjoin(recent, recent.c.user_id == DonorProfile.user_id)
+    )
+
+
+def donor_rows_query(today=None):
+    """Same rows as index_rows_query(), counting each donor's donations separately.
+
+    The count is correlated, so a filter on the donors keeps the work to
+    their own history (ix_donation_history_user_type_date).
+    """
+    since = (today or date.today()) - timedelta(days=RESPONSIVENESS_WINDOW_DAYS)
+    recent = (
+        select(func.count(DonationHistory.id))
+        .where(
+            DonationHistory.user_id == DonorProfile.user_id,
+            DonationHistory.entry_type == "donation",
+            DonationHistory.date >= since,
+        )
+        .correlate(DonorProfile)
+        .scalar_subquery()
+    )
+    return select(*INDEX_COLUMNS, recent).join(User, DonorProfile.user_id == User.id)
+
+
+def index_entry(row):
+    """The index entry for one index_rows_query() or donor_rows_query() row."""
+    return DonorIndex._entry(*row)
+
+
+async def load_donor_index(db):
+    synced_at = (await db.execute(select(func.localtimestamp()))).scalar()
+    result = await db.stream(index_rows_query().execution_options(yield_per=5000))
+    donor_index.build([tuple(row) async for row in result])
+    donor_index.synced_at = synced_at
+    return len(donor_index)
+
+
+# --- CROSS-WORKER SYNC ---
+# Each uvicorn worker holds its own index, and upsert() only reaches the
+# process that handled the write. So every write that changes what the
+# index holds for a donor (profile, eligibility, recent donations, name)
+# also sets donor_profiles.updated_at, and each worker re-reads the donors
+# changed since its last sync from app/match_worker.py's sweep. The
+# watermark trails by INDEX_SYNC_OVERLAP so a row committed a little after
+# its timestamp is still picked up; reading a donor twice is harmless.
+INDEX_SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def db_clock():
+    # Statement time, not transaction start, so a long import stamps its
+    # rows close to its commit.
+    return cast(func.clock_timestamp(), DateTime)
+
+
+def touch_donors(user_ids):
+    """UPDATE marking these users' donor profiles changed, for the other workers' indexes."""
+    return (
+        update(DonorProfile)
+        .where(DonorProfile.user_id == any_(literal(list(user_ids), ARRAY(Integer))))
+        .values(updated_at=db_clock())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def sync_donor_index(db):
+    """Re-read the donors changed since the last load or sync; returns how many."""
+    if donor_index.synced_at is None:
+        return 0
+    started = (await db.execute(select(func.localtimestamp()))).scalar()
+    rows = (await db.execute(
+        donor_rows_query().where(DonorProfile.updated_at >= donor_index.synced_at - INDEX_SYNC_OVERLAP)
+    )).all()
+    donor_index.refresh(rows)
+    donor_index.synced_at = started
+    return len(rows)
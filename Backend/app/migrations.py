@@ -0,0 +1,158 @@
+from datetime import datetime
+from sqlalchemy import text
+
+from app.geo import CITY_COORDINATES
+from app.matching import DONATION_DEFERRAL_DAYS
+from app.stock import rebuild_rollup
+
+# --- VERSIONED MIGRATIONS ---
+# Each migration is (version, name, steps). A step is either a SQL string or a
+# callable taking the connection. Applied versions are recorded in
+# schema_migrations, so every migration runs exactly once per database.
+# Steps must be idempotent (IF NOT EXISTS): databases created before
+# migrations existed already have the version 1 tables.
+# Migrations are the only source of schema: version 1 is the original
+# schema frozen as SQL, and every index lives here, not in app/models.py.
+
+INITIAL_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS users ("
+    "id SERIAL PRIMARY KEY, full_name VARCHAR, email VARCHAR, password VARCHAR, role VARCHAR, "
+    "phone_number VARCHAR, age INTEGER, blood_group VARCHAR, city VARCHAR)",
+    "CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)",
+    "CREATE INDEX IF NOT EXISTS ix_users_full_name ON users (full_name)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+    "CREATE TABLE IF NOT EXISTS donor_profiles ("
+    "id SERIAL PRIMARY KEY, user_id INTEGER UNIQUE REFERENCES users (id), blood_group VARCHAR, "
+    "city VARCHAR, age INTEGER, last_donation_date DATE)",
+    "CREATE INDEX IF NOT EXISTS ix_donor_profiles_id ON donor_profiles (id)",
+    "CREATE TABLE IF NOT EXISTS recipient_requests ("
+    "id SERIAL PRIMARY KEY, user_id INTEGER REFERENCES users (id), blood_group VARCHAR, city VARCHAR, "
+    "urgency VARCHAR, fulfilled BOOLEAN, created_at DATE)",
+    "CREATE INDEX IF NOT EXISTS ix_recipient_requests_id ON recipient_requests (id)",
+    "CREATE TABLE IF NOT EXISTS donation_history ("
+    "id SERIAL PRIMARY KEY, user_id INTEGER REFERENCES users (id), entry_type VARCHAR, date DATE, "
+    "hospital VARCHAR, blood_group VARCHAR, quantity INTEGER)",
+    "CREATE INDEX IF NOT EXISTS ix_donation_history_id ON donation_history (id)",
+]
+
+
+def _backfill_coordinates(conn):
+    # Rows written before coordinates existed get their city's centre.
+    for table in ("donor_profiles", "recipient_requests"):
+        for city, (latitude, longitude) in CITY_COORDINATES.items():
+            conn.execute(
+                text(f"UPDATE {table} SET latitude = :lat, longitude = :lon "
+                     "WHERE latitude IS NULL AND lower(city) = :city"),
+                {"lat": latitude, "lon": longitude, "city": city},
+            )
+
+
+MIGRATIONS = [
+    (1, "initial schema", INITIAL_SCHEMA),
+    (2, "indexes for hot filter columns", [
+        "CREATE INDEX IF NOT EXISTS ix_donor_profiles_city_blood_group "
+        "ON donor_profiles (city, blood_group)",
+        "CREATE INDEX IF NOT EXISTS ix_donor_profiles_lower_city_blood_group "
+        "ON donor_profiles (lower(city), blood_group)",
+        "CREATE INDEX IF NOT EXISTS ix_donor_profiles_blood_group "
+        "ON donor_profiles (blood_group)",
+        "CREATE INDEX IF NOT EXISTS ix_recipient_requests_unfulfilled "
+        "ON recipient_requests (id) WHERE fulfilled = false",
+        "CREATE INDEX IF NOT EXISTS ix_donation_history_entry_type_date "
+        "ON donation_history (entry_type, date)",
+        "CREATE INDEX IF NOT EXISTS ix_donation_history_date "
+        "ON donation_history (date)",
+    ]),
+    (3, "coordinates on donor profiles and requests", [
+        "ALTER TABLE donor_profiles ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION",
+        "ALTER TABLE donor_profiles ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION",
+        "ALTER TABLE recipient_requests ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION",
+        "ALTER TABLE recipient_requests ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION",
+        _backfill_coordinates,
+    ]),
+    (4, "stored donor eligibility", [
+        "ALTER TABLE donor_profiles ADD COLUMN IF NOT EXISTS next_eligible_date DATE",
+        "UPDATE donor_profiles SET next_eligible_date = last_donation_date + "
+        f"{DONATION_DEFERRAL_DAYS} WHERE last_donation_date IS NOT NULL AND next_eligible_date IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_donor_profiles_next_eligible_date "
+        "ON donor_profiles (next_eligible_date)",
+    ]),
+    (5, "per-donor history index", [
+        "CREATE INDEX IF NOT EXISTS ix_donation_history_user_type_date "
+        "ON donation_history (user_id, entry_type, date, id)",
+    ]),
+    (6, "blood stock rollup", [
+        "CREATE TABLE IF NOT EXISTS blood_stock_rollup ("
+        "date DATE NOT NULL, blood_group VARCHAR NOT NULL, hospital VARCHAR NOT NULL, "
+        "donated_units INTEGER NOT NULL DEFAULT 0, received_units INTEGER NOT NULL DEFAULT 0, "
+        "PRIMARY KEY (date, blood_group, hospital))",
+        rebuild_rollup,
+    ]),
+    (7, "request claims", [
+        "ALTER TABLE recipient_requests ADD COLUMN IF NOT EXISTS claimed_by INTEGER REFERENCES users (id)",
+        "ALTER TABLE recipient_requests ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP",
+        "ALTER TABLE recipient_requests ADD COLUMN IF NOT EXISTS fulfilled_at TIMESTAMP",
+    ]),
+    (8, "materialized request matches", [
+        "ALTER TABLE recipient_requests ADD COLUMN IF NOT EXISTS matched_at TIMESTAMP",
+        "CREATE TABLE IF NOT EXISTS request_matches ("
+        "request_id INTEGER NOT NULL REFERENCES recipient_requests (id) ON DELETE CASCADE, "
+        "donor_id INTEGER NOT NULL REFERENCES donor_profiles (id) ON DELETE CASCADE, "
+        "score DOUBLE PRECISION NOT NULL, distance_km DOUBLE PRECISION, "
+        "PRIMARY KEY (request_id, donor_id))",
+        "CREATE INDEX IF NOT EXISTS ix_request_matches_request_score ON request_matches (request_id, score)",
+        "CREATE INDEX IF NOT EXISTS ix_request_matches_donor_id ON request_matches (donor_id)",
+    ]),
+    (9, "durable match invalidation", [
+        "ALTER TABLE donor_profiles ADD COLUMN IF NOT EXISTS matches_stale BOOLEAN NOT NULL DEFAULT false",
+        "CREATE INDEX IF NOT EXISTS ix_donor_profiles_matches_stale ON donor_profiles (id) WHERE matches_stale",
+        "CREATE INDEX IF NOT EXISTS ix_recipient_requests_unmatched "
+        "ON recipient_requests (matched_at) WHERE fulfilled = false",
+    ]),
+    (10, "donor index sync", [
+        "ALTER TABLE donor_profiles ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT now()",
+        "CREATE INDEX IF NOT EXISTS ix_donor_profiles_updated_at ON donor_profiles (updated_at)",
+    ]),
+]
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_versions(conn):
+    _ensure_version_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def migrate(engine, target=None, log=print):
+    """Apply pending migrations up to `target` (default: latest). Returns the versions applied."""
+    applied = []
+    with engine.begin() as conn:
+        # Serialize concurrent migrators (e.g. several workers starting at once).
+        conn.execute(text("SELECT pg_advisory_xact_lock(8241017)"))
+        done = applied_versions(conn)
+        for version, name, steps in MIGRATIONS:
+            if version in done or (target is not None and version > target):
+                continue
+            log(f"Applying migration {version}: {name}")
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(text(step))
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.utcnow()},
+            )
+            applied.append(version)
+    return applied
+
+
+def current_version(engine):
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    return max(done) if done else 0
@@ -1,13 +1,16 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Float, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 
+# The schema, indexes included, is created by app/migrations.py; these
+# classes only map it.
+
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
-    full_name = Column(String, index=True)
-    email = Column(String, unique=True, index=True)
+    id = Column(Integer, primary_key=True)
+    full_name = Column(String)
+    email = Column(String, unique=True)
     # CNIC Removed
     password = Column(String)
     role = Column(String)
@@ -19,39 +22,75 @@ class User(Base):
     # Relationships (Must exist to prevent crashes)
     history = relationship("DonationHistory", back_populates="user", cascade="all, delete-orphan")
     donor_profile = relationship("DonorProfile", back_populates="user", uselist=False)
-    requests = relationship("RecipientRequest", back_populates="user")
+    requests = relationship("RecipientRequest", back_populates="user", foreign_keys="RecipientRequest.user_id")
 
 # ... (Keep DonorProfile, RecipientRequest, DonationHistory EXACTLY as they were in the previous step) ...
 # To be safe, I will include the full file below so nothing is missed.
 
 class DonorProfile(Base):
     __tablename__ = "donor_profiles"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True)
     blood_group = Column(String)
     city = Column(String)
     age = Column(Integer)
     last_donation_date = Column(Date, nullable=True)
+    # last_donation_date + deferral interval; kept in sync by the write paths.
+    next_eligible_date = Column(Date, nullable=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    # Set in the same transaction as any change to how the donor matches;
+    # cleared once app/match_worker.py has rescored the donor.
+    matches_stale = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+    # Set by every write to what the donor index holds for this donor, so the
+    # other worker processes reload it (app/matching.py, CROSS-WORKER SYNC).
+    updated_at = Column(DateTime, nullable=False, server_default=text("now()"))
     user = relationship("User", back_populates="donor_profile")
 
 class RecipientRequest(Base):
     __tablename__ = "recipient_requests"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     blood_group = Column(String)
     city = Column(String)
     urgency = Column(String, default="normal")
     fulfilled = Column(Boolean, default=False)
     created_at = Column(Date, nullable=True)
-    user = relationship("User", back_populates="requests")
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    # Set by POST /recipient/{id}/claim; a claim older than CLAIM_TTL can be taken over.
+    claimed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    fulfilled_at = Column(DateTime, nullable=True)
+    # When request_matches was last filled for this request (app/match_worker.py).
+    matched_at = Column(DateTime, nullable=True)
+    user = relationship("User", back_populates="requests", foreign_keys=[user_id])
 
 class DonationHistory(Base):
     __tablename__ = "donation_history"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     entry_type = Column(String)
     date = Column(Date)
     hospital = Column(String)
     blood_group = Column(String)
     quantity = Column(Integer, default=1)
-    user = relationship("User", back_populates="history")
\ No newline at end of file
+    user = relationship("User", back_populates="history")
+
+class BloodStockRollup(Base):
+    # Units per day, blood group and hospital, kept in step with
+    # donation_history by every write path (see app/stock.py).
+    __tablename__ = "blood_stock_rollup"
+    date = Column(Date, primary_key=True)
+    blood_group = Column(String, primary_key=True)
+    hospital = Column(String, primary_key=True)  # '' when the entry has none
+    donated_units = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    received_units = Column(Integer, nullable=False, default=0, server_default=text("0"))
+
+class RequestMatch(Base):
+    # Materialized top donors per open request, best score first; see app/match_worker.py.
+    __tablename__ = "request_matches"
+    request_id = Column(Integer, ForeignKey("recipient_requests.id", ondelete="CASCADE"), primary_key=True)
+    donor_id = Column(Integer, ForeignKey("donor_profiles.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+    distance_km = Column(Float, nullable=True)
@@ -0,0 +1,59 @@
+from typing import Callable, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+
+# --- KEYSET PAGINATION ---
+# Pages are ordered by primary key and continue from the last id seen, so a
+# page costs the same whether it is the first or the thousandth. The id to
+# pass as ?cursor= for the next page is returned in the X-Next-Cursor header.
+# Paging is opt-in: a request with neither ?limit= nor ?cursor= still gets
+# the whole list, as before, so existing clients (the frontend) keep working.
+# The body is a plain list either way.
+# Statements select plain columns (one of them labelled `id`), not entities,
+# so rows come back as tuples without ORM identity-map overhead.
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+
+
+async def keyset_page(db: AsyncSession, stmt, id_column, cursor: Optional[int], limit: Optional[int],
+                      response: Response):
+    if cursor is None and limit is None:
+        return (await db.execute(stmt.order_by(id_column))).all()
+    if cursor is not None:
+        stmt = stmt.where(id_column > cursor)
+    limit = limit or DEFAULT_PAGE_SIZE
+    rows = (await db.execute(stmt.order_by(id_column).limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    return rows
+
+
+def json_response(content, response: Response):
+    # Returning a Response skips FastAPI's jsonable_encoder pass; orjson
+    # serializes dates natively. Headers set on the injected `response`
+    # (cursor, ETag) are carried over, since FastAPI drops it otherwise.
+    return ORJSONResponse(content, headers=dict(response.headers))
+
+
+# --- NDJSON STREAMING ---
+# Exports the whole result one line per row. Rows come from a server-side
+# cursor in batches of STREAM_BATCH_SIZE, so memory stays flat however large
+# the table is. The stream owns its session because the request-scoped one
+# is closed before the body finishes sending.
+
+def stream_ndjson(stmt, serialize: Callable):
+    async def generate():
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for row in result:
+                yield orjson.dumps(serialize(row)) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
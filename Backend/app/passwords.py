@@ -0,0 +1,64 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+# --- PASSWORD HASHING ---
+# bcrypt is deliberately slow (tens to hundreds of ms per call), so request
+# handlers never run it themselves: they await the *_async helpers, which run
+# the work in a small process pool. At most PASSWORD_MAX_PENDING jobs are
+# queued on the pool; further callers wait their turn without holding a
+# worker. This module must not import the database: pool processes import it.
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(PASSWORD_WORKERS * 4)))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def verify_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def hash_password(password):
+    return pwd_context.hash(password)
+
+
+_pool = None
+_pending = None
+
+
+def _get_pool():
+    global _pool, _pending
+    if _pool is None:
+        # spawn, not fork: the parent holds DB connections and threads.
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+        _pending = asyncio.Semaphore(PASSWORD_MAX_PENDING)
+    return _pool
+
+
+async def _run(fn, *args):
+    pool = _get_pool()
+    async with _pending:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+async def hash_password_async(password):
+    return await _run(hash_password, password)
+
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run(verify_password, plain_password, hashed_password)
+
+
+def shutdown_password_pool():
+    global _pool, _pending
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pending = None
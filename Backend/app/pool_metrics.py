@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger("app.pool")
+
+# --- CONNECTION POOL SETTINGS ---
+# Read by app/database.py when it builds the async engine.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))        # seconds to wait for a connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))        # seconds; -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# A checkout that waits longer than this is logged with the pool state.
+POOL_WAIT_WARN_MS = float(os.getenv("DB_POOL_WAIT_WARN_MS", "100"))
+# Seconds between periodic pool summary log lines (0 disables them).
+POOL_LOG_INTERVAL = float(os.getenv("DB_POOL_LOG_INTERVAL", "60"))
+# Weight of the newest checkout in recent_wait.
+RECENT_WAIT_WEIGHT = 0.2
+
+# --- CONNECTION POOL METRICS ---
+# TimedQueuePool times every checkout, so the time a request spends queued
+# for a connection is visible in /internal/pool and in the logs. That is
+# the number needed to size DB_POOL_SIZE / DB_MAX_OVERFLOW from data.
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+        # Exponentially weighted wait of recent checkouts, for admission control.
+        self.recent_wait = 0.0
+        self.recent_at = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.last_wait = waited
+            self.recent_wait += RECENT_WAIT_WEIGHT * (waited - self.recent_wait)
+            self.recent_at = time.monotonic()
+
+    def current_wait(self, max_age: float):
+        """Recent checkout wait in seconds; 0 if nothing was checked out in the last max_age seconds."""
+        with self._lock:
+            if time.monotonic() - self.recent_at > max_age:
+                return 0.0
+            return self.recent_wait
+
+    def snapshot(self, pool):
+        with self._lock:
+            avg_wait = self.total_wait / self.checkouts if self.checkouts else 0.0
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "max_overflow": DB_MAX_OVERFLOW,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(avg_wait * 1000, 3),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "last_wait_ms": round(self.last_wait * 1000, 3),
+                "recent_wait_ms": round(self.recent_wait * 1000, 3),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            waited = time.perf_counter() - started
+            pool_metrics.record(waited, timed_out=True)
+            logger.error("DB pool checkout timed out after %.0f ms: %s", waited * 1000, pool_metrics.snapshot(self))
+            raise
+        waited = time.perf_counter() - started
+        pool_metrics.record(waited)
+        if waited * 1000 > POOL_WAIT_WARN_MS:
+            logger.warning("DB pool checkout waited %.0f ms: %s", waited * 1000, pool_metrics.snapshot(self))
+        return conn
+
+
+async def log_pool_periodically(pool):
+    while True:
+        await asyncio.sleep(POOL_LOG_INTERVAL)
+        logger.info("DB pool: %s", pool_metrics.snapshot(pool))
@@ -0,0 +1,48 @@
+import os
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+# --- PER-REQUEST QUERY COUNTER ---
+# Engine events add every statement and its duration to the stats object of
+# the request being served. The object is put in a ContextVar by the HTTP
+# middleware; the ContextVar is copied into the threadpool that runs sync
+# endpoints, so the counts include queries made from either kind of handler.
+# With DEBUG=1 the totals are sent back as X-DB-Query-Count / X-DB-Time-Ms.
+
+DEBUG = os.getenv("DEBUG", "").lower() in ("1", "true", "yes")
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_current_stats: ContextVar = ContextVar("query_stats", default=None)
+
+
+def start_request_stats() -> QueryStats:
+    stats = QueryStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def install_query_counter(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += time.perf_counter() - started
+
+
+def add_stats_headers(response, stats: QueryStats):
+    response.headers["X-DB-Query-Count"] = str(stats.count)
+    response.headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.2f}"
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+
+from .matching import RECIPIENT_COMPATIBILITY, normalize_city
+
+logger = logging.getLogger("app.pubsub")
+
+# --- PUB/SUB ---
+# Fan-out for server push (GET /donor/stream). Publishers send a message to
+# a set of topics; every subscriber of any of those topics gets it once.
+# The default backend delivers within this worker process only. With several
+# workers, replace it through set_broker() with one backed by a shared bus
+# (e.g. Redis pub/sub) implementing the same two methods.
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Broker(ABC):
+    @abstractmethod
+    async def publish(self, topics, message):
+        """Deliver `message` once to every subscriber of any of `topics`."""
+
+    @abstractmethod
+    def subscribe(self, topics):
+        """Async context manager yielding an object with `async get()`."""
+
+
+class InMemoryBroker(Broker):
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._topics = {}    # topic -> set of subscriber queues
+        self.dropped = 0
+
+    async def publish(self, topics, message):
+        queues = set()
+        for topic in topics:
+            queues.update(self._topics.get(topic, ()))
+        for queue in queues:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A stalled client loses messages rather than holding memory.
+                self.dropped += 1
+        return len(queues)
+
+    @asynccontextmanager
+    async def subscribe(self, topics):
+        queue = asyncio.Queue(self.queue_size)
+        for topic in topics:
+            self._topics.setdefault(topic, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            for topic in topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(queue)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def subscriber_count(self):
+        return sum(len(queues) for queues in self._topics.values())
+
+
+broker = InMemoryBroker()
+
+
+def get_broker():
+    return broker
+
+
+def set_broker(backend: Broker):
+    global broker
+    broker = backend
+
+
+# --- TOPICS ---
+# Donors listen on their own (city, blood group); a new request is published
+# to every donor group that can give to it in the request's city.
+
+def donor_topic(city, blood_group):
+    return f"requests:{normalize_city(city)}:{blood_group}"
+
+
+def request_topics(city, blood_group):
+    return [donor_topic(city, donor_group) for donor_group in RECIPIENT_COMPATIBILITY.get(blood_group, ())]
@@ -0,0 +1,216 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+
+from .auth import ALGORITHM, SECRET_KEY
+from .pool_metrics import pool_metrics
+
+
+def _enabled(name, default="true"):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def parse_rate(value):
+    """Parse "N/second|minute|hour" into (tokens per second, burst of N); None when empty or zero."""
+    if not value:
+        return None
+    count, _, unit = value.partition("/")
+    seconds = {"second": 1, "minute": 60, "hour": 3600}[unit.strip() or "second"]
+    count = int(count)
+    return (count / seconds, count) if count > 0 else None
+
+
+# --- RATE LIMITS ---
+# Token buckets per client IP and per signed-in user (the token subject),
+# for the routes in RATE_LIMIT_RULES; the first rule matching the method and
+# path prefix applies. A request over either bucket gets 429 with Retry-After
+# and never reaches the route, so a login burst costs no bcrypt work.
+# Each rate is "N/unit" (N requests per unit, bursts of up to N) read from
+# the environment; an empty value or 0 turns that bucket off, and
+# RATE_LIMIT_ENABLED=0 turns the limiter off. Buckets live in this worker
+# process, like the other caches.
+
+RATE_LIMIT_ENABLED = _enabled("RATE_LIMIT_ENABLED")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Behind proxies (the ngrok agent, a load balancer) the peer address is the
+# last proxy's. When the peer is in TRUSTED_PROXIES, the client is read from
+# X-Forwarded-For instead: each proxy appends the address it saw, so with
+# TRUSTED_PROXY_HOPS proxies the client is that many entries from the right;
+# anything further left came from the client and is ignored. The defaults
+# fit the ngrok agent on the same host. TRUSTED_PROXY_HOPS=0 always uses the
+# peer address.
+TRUSTED_PROXIES = {
+    address.strip() for address in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if address.strip()
+}
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# (name, methods, path prefixes, per-IP rate, per-user rate)
+RATE_LIMIT_RULES = [
+    ("auth", {"POST"}, ("/auth/login", "/auth/signup"),
+     parse_rate(os.getenv("RATE_LIMIT_AUTH_IP", "10/minute")), None),
+    ("write", WRITE_METHODS, ("/recipient", "/donor", "/history", "/auth/profile"),
+     parse_rate(os.getenv("RATE_LIMIT_WRITE_IP", "300/minute")),
+     parse_rate(os.getenv("RATE_LIMIT_WRITE_USER", "60/minute"))),
+]
+
+
+class TokenBuckets:
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()   # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def take(self, key, rate):
+        """Spend one token; returns 0 if allowed, else seconds until a token is available."""
+        per_second, burst = rate
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * per_second)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / per_second
+                self.rejected += 1
+            # Least recently used keys go first; a dropped bucket only resets to full.
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+buckets = TokenBuckets()
+
+
+def client_ip(scope, headers):
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    forwarded = headers.get(b"x-forwarded-for")
+    if forwarded and TRUSTED_PROXY_HOPS > 0 and peer in TRUSTED_PROXIES:
+        hops = [hop.strip() for hop in forwarded.decode("latin-1").split(",") if hop.strip()]
+        if hops:
+            return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    return peer
+
+
+def token_subject(headers):
+    """The email in a valid bearer token, without touching the database; None otherwise."""
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+
+def _match_rule(method, path):
+    for rule in RATE_LIMIT_RULES:
+        name, methods, prefixes, _, _ = rule
+        if method in methods and path.startswith(prefixes):
+            return rule
+    return None
+
+
+def _rejection(status_code, detail, retry_after):
+    return JSONResponse(
+        {"detail": detail}, status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class RateLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        rule = _match_rule(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        name, _, _, ip_rate, user_rate = rule
+        headers = dict(scope["headers"])
+        wait = 0.0
+        if ip_rate:
+            wait = buckets.take((name, "ip", client_ip(scope, headers)), ip_rate)
+        if not wait and user_rate:
+            subject = token_subject(headers)
+            if subject is not None:
+                wait = buckets.take((name, "user", subject), user_rate)
+        if wait:
+            await _rejection(429, "Too many requests; slow down.", wait)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+# --- ADMISSION CONTROL ---
+# Past ADMISSION_MAX_IN_FLIGHT concurrent requests, or once recent DB pool
+# checkouts wait longer than ADMISSION_MAX_POOL_WAIT_MS, new requests get an
+# immediate 503 with Retry-After instead of queueing behind the backlog, so
+# the requests already admitted keep their latency. The pool signal expires
+# after ADMISSION_WAIT_WINDOW seconds without checkouts, so the server starts
+# admitting again once the backlog drains. Long-lived streams and the
+# health/operator routes are neither counted nor refused.
+# ADMISSION_CONTROL_ENABLED=0 turns it off.
+
+ADMISSION_CONTROL_ENABLED = _enabled("ADMISSION_CONTROL_ENABLED")
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "256"))
+ADMISSION_MAX_POOL_WAIT_MS = float(os.getenv("ADMISSION_MAX_POOL_WAIT_MS", "500"))
+ADMISSION_WAIT_WINDOW = float(os.getenv("ADMISSION_WAIT_WINDOW", "2"))
+ADMISSION_RETRY_AFTER = float(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+ADMISSION_EXEMPT_PATHS = {"/", "/donor/stream", "/internal/pool", "/internal/admission"}
+
+
+class AdmissionStats:
+    def __init__(self):
+        self.in_flight = 0
+        self.rejected_in_flight = 0
+        self.rejected_pool_wait = 0
+
+    def snapshot(self):
+        return {
+            "in_flight": self.in_flight,
+            "rejected_in_flight": self.rejected_in_flight,
+            "rejected_pool_wait": self.rejected_pool_wait,
+            "rate_limited": buckets.rejected,
+        }
+
+
+admission_stats = AdmissionStats()
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in ADMISSION_EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        # The counter is only touched from the event loop, so it needs no lock.
+        if admission_stats.in_flight >= ADMISSION_MAX_IN_FLIGHT:
+            admission_stats.rejected_in_flight += 1
+            await _rejection(503, "Server is busy; try again shortly.", ADMISSION_RETRY_AFTER)(scope, receive, send)
+            return
+        if pool_metrics.current_wait(ADMISSION_WAIT_WINDOW) * 1000 > ADMISSION_MAX_POOL_WAIT_MS:
+            admission_stats.rejected_pool_wait += 1
+            await _rejection(503, "Server is busy; try again shortly.", ADMISSION_RETRY_AFTER)(scope, receive, send)
+            return
+
+        admission_stats.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission_stats.in_flight -= 1
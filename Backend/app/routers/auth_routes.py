@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from pydantic import BaseModel
 from typing import Optional # <--- CRITICAL
@@ -7,12 +8,14 @@ from typing import Optional # <--- CRITICAL
 from app.database import get_db
 from app.models import User as UserModel
 from app.auth import (
-    verify_password, 
-    hash_password, 
+    verify_password_async,
+    hash_password_async,
     create_access_token, 
     get_current_user,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from app.cache import bump_tables, invalidate_user
+from app.matching import donor_index, touch_donors
 
 router = APIRouter()
 
@@ -40,13 +43,21 @@ class Token(BaseModel):
     token_type: str
     user: dict
 
+# Roles a user may pick at signup; others (admin, hospital) are granted in the database.
+SIGNUP_ROLES = {"donor", "recipient"}
+
 # --- 1. SIGNUP ---
 @router.post("/signup", response_model=Token, status_code=status.HTTP_201_CREATED)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
-    if db.query(UserModel).filter(UserModel.email == user.email).first():
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    if user.role not in SIGNUP_ROLES:
+        raise HTTPException(status_code=400, detail="role must be donor or recipient")
+    taken = (await db.execute(select(UserModel.id).where(UserModel.email == user.email))).first()
+    # Give the connection back before the bcrypt wait; the insert checks one out again.
+    await db.rollback()
+    if taken:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await hash_password_async(user.password)
     new_user = UserModel(
         full_name=user.full_name,
         email=user.email,
@@ -60,8 +71,8 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     access_token = create_access_token(data={"sub": new_user.email})
     return {
@@ -72,13 +83,19 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
 
 # --- 2. LOGIN ---
 @router.post("/login", response_model=Token)
-def login(form_data: dict, db: Session = Depends(get_db)):
+async def login(form_data: dict, db: AsyncSession = Depends(get_db)):
     email = form_data.get("email")
     password = form_data.get("password")
 
-    user = db.query(UserModel).filter(UserModel.email == email).first()
+    # Plain columns, so the row stays readable after the rollback below, which
+    # returns the connection to the pool for the bcrypt wait.
+    user = (await db.execute(
+        select(UserModel.id, UserModel.email, UserModel.full_name, UserModel.role, UserModel.password)
+        .where(UserModel.email == email)
+    )).first()
+    await db.rollback()
     
-    if not user or not verify_password(password, user.password):
+    if not user or not await verify_password_async(password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -98,7 +115,7 @@ def login(form_data: dict, db: Session = Depends(get_db)):
 
 # --- 3. GET PROFILE ---
 @router.get("/profile")
-def read_users_me(current_user: UserModel = Depends(get_current_user)):
+async def read_users_me(current_user: UserModel = Depends(get_current_user)):
     return {
         "id": current_user.id,
         "full_name": current_user.full_name,
@@ -112,9 +129,9 @@ def read_users_me(current_user: UserModel = Depends(get_current_user)):
 
 # --- 4. UPDATE PROFILE ---
 @router.put("/profile/update")
-def update_profile(
+async def update_profile(
     user_data: UserUpdate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     current_user: UserModel = Depends(get_current_user)
 ):
     if user_data.full_name: 
@@ -127,9 +144,15 @@ def update_profile(
         current_user.blood_group = user_data.blood_group
     if user_data.city: 
         current_user.city = user_data.city
+    if user_data.full_name:
+        # Donor entries carry the name.
+        await db.execute(touch_donors([current_user.id]))
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    invalidate_user(current_user.email)
+    bump_tables("users")
+    await db.refresh(current_user)
+    donor_index.rename(current_user.id, current_user.full_name)
     
     return {
         "id": current_user.id,
@@ -1,21 +1,42 @@
+import asyncio
+import json
 from datetime import date
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import DonorProfile, User
-from app.auth import get_current_user
+from app.auth import get_current_user, get_stream_user
+from app.cache import bump_tables, invalidate_dashboard
+from app.etags import make_etag, not_modified, set_etag
+from app.geo import resolve_coordinates
+from app.match_worker import drop_donor_matches, enqueue
+from app.matching import db_clock, donor_index, is_eligible, next_eligible_date, normalize_city
+from app.pagination import MAX_PAGE_SIZE, json_response, keyset_page, stream_ndjson
+from app.pubsub import donor_topic, get_broker
+from app.schemas import DonorListItem, DonorProfileOut
 
 router = APIRouter()
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
-def upsert_donor_profile(
+def _match_inputs(profile: DonorProfile):
+    # What decides which requests a donor is matched to (see app/match_worker.py).
+    # Age and the exact donation date only move scores, which the daily refresh picks up.
+    return (profile.blood_group, normalize_city(profile.city), profile.latitude, profile.longitude,
+            is_eligible(profile.next_eligible_date))
+
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=DonorProfileOut,
+             response_class=ORJSONResponse)
+async def upsert_donor_profile(
     data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    existing = db.query(DonorProfile).filter(DonorProfile.user_id == current_user.id).first()
+    existing = (
+        await db.execute(select(DonorProfile).where(DonorProfile.user_id == current_user.id))
+    ).scalar_one_or_none()
 
     blood_group = data.get("blood_group")
     city = data.get("city")
@@ -35,14 +56,35 @@ def upsert_donor_profile(
             detail="blood_group, city and age are required.",
         )
 
+    try:
+        latitude, longitude = resolve_coordinates(city, data.get("latitude"), data.get("longitude"))
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="latitude and longitude must be numbers.",
+        )
+
     if existing:
+        before = _match_inputs(existing)
         existing.blood_group = blood_group
         existing.city = city
         existing.age = age
         existing.last_donation_date = last_donation_date
+        existing.next_eligible_date = next_eligible_date(last_donation_date)
+        existing.latitude = latitude
+        existing.longitude = longitude
+        existing.updated_at = db_clock()
         db.add(existing)
-        db.commit()
-        db.refresh(existing)
+        rematch = _match_inputs(existing) != before
+        if rematch:
+            await drop_donor_matches(db, [existing.id])
+        await db.commit()
+        await db.refresh(existing)
+        donor_index.upsert(existing, current_user.full_name)
+        if rematch:
+            enqueue("donor", existing.id)
+        bump_tables("donor_profiles")
+        invalidate_dashboard()
         return existing
 
     profile = DonorProfile(
@@ -51,26 +93,111 @@ def upsert_donor_profile(
         city=city,
         age=age,
         last_donation_date=last_donation_date,
+        next_eligible_date=next_eligible_date(last_donation_date),
+        latitude=latitude,
+        longitude=longitude,
+        matches_stale=True,
+        updated_at=db_clock(),
     )
     db.add(profile)
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
+    donor_index.upsert(profile, current_user.full_name)
+    enqueue("donor", profile.id)
+    bump_tables("donor_profiles")
+    invalidate_dashboard()
     return profile
 
-@router.get("/all")
-def list_donors(db: Session = Depends(get_db)):
-    profiles = db.query(DonorProfile).join(User).all()
-    
-    return [
-        {
-            "id": p.id,
-            "full_name": p.user.full_name,
-            "email": p.user.email,
-            "phone_number": p.user.phone_number, # <--- FIX: Added Phone Number
-            "blood_group": p.blood_group,
-            "city": p.city,
-            "age": p.age,
-            "last_donation_date": p.last_donation_date.strftime("%Y-%m-%d") if p.last_donation_date else "Never"
-        }
-        for p in profiles
-    ]
\ No newline at end of file
+# Columns of DonorListItem, fetched as tuples.
+DONOR_LIST_COLUMNS = (
+    DonorProfile.id,
+    User.full_name,
+    User.email,
+    User.phone_number,
+    DonorProfile.blood_group,
+    DonorProfile.city,
+    DonorProfile.age,
+    DonorProfile.last_donation_date,
+)
+
+def _donor_query(city: Optional[str], blood_group: Optional[str]):
+    stmt = select(*DONOR_LIST_COLUMNS).join(User, DonorProfile.user_id == User.id)
+    if city:
+        stmt = stmt.where(func.lower(DonorProfile.city) == city.strip().lower())
+    if blood_group:
+        stmt = stmt.where(DonorProfile.blood_group == blood_group)
+    return stmt
+
+def _donor_item(row):
+    # Dates are left to orjson, which writes them as YYYY-MM-DD.
+    item = row._asdict()
+    if item["last_donation_date"] is None:
+        item["last_donation_date"] = "Never"
+    return item
+
+# Tables /donor/all reads; their versions make up its ETag.
+DONOR_LIST_TABLES = ("donor_profiles", "users")
+
+@router.get("/all", response_model=List[DonorListItem], response_class=ORJSONResponse)
+async def list_donors(
+    request: Request,
+    response: Response,
+    # Omit both limit and cursor for the whole list; see app/pagination.py.
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+    city: Optional[str] = None,
+    blood_group: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    etag = make_etag(request, DONOR_LIST_TABLES)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    stmt = _donor_query(city, blood_group)
+    if format == "ndjson":
+        if cursor is not None:
+            stmt = stmt.where(DonorProfile.id > cursor)
+        streamed = stream_ndjson(stmt.order_by(DonorProfile.id), _donor_item)
+        set_etag(streamed, etag)
+        return streamed
+
+    rows = await keyset_page(db, stmt, DonorProfile.id, cursor, limit, response)
+    set_etag(response, etag)
+    return json_response([_donor_item(row) for row in rows], response)
+
+# --- PUSH: NEW MATCHING REQUESTS ---
+# Server-Sent Events replace polling /recipient/all: each new request that a
+# donor could give to is pushed as an `event: request` line. Comment lines
+# every STREAM_HEARTBEAT_SECONDS keep proxies from closing idle streams.
+STREAM_HEARTBEAT_SECONDS = 15
+
+@router.get("/stream")
+async def stream_matching_requests(current_user: User = Depends(get_stream_user)):
+    profile = donor_index.lookup(current_user.id)
+    city = profile["city"] if profile else current_user.city
+    blood_group = profile["blood_group"] if profile else current_user.blood_group
+    if not city or not blood_group:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Set a blood group and city to receive matching requests.",
+        )
+    topics = [donor_topic(city, blood_group)]
+
+    async def events():
+        async with get_broker().subscribe(topics) as subscription:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: request\ndata: {json.dumps(message)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Date, cast, func, or_, select, tuple_, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from datetime import date
 from app.database import get_db
-from app.models import DonationHistory, User
+from app.models import DonationHistory, DonorProfile, User
 # FIX: Import correctly
 from app.auth import get_current_user
+from app.cache import bump_tables, invalidate_dashboard
+from app.history_import import import_history
+from app.match_worker import drop_donor_matches, enqueue
+from app.matching import db_clock, donor_index, next_eligible_date, touch_donors
+from app.schemas import HistoryResponse, HistorySummary
+from app.stock import add_entry, apply_stock_deltas, stock_deltas
 
 router = APIRouter()
 
@@ -16,9 +25,9 @@ class HistoryCreate(BaseModel):
     units: int = 1
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def log_history(
+async def log_history(
     data: HistoryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     # FIX: Use get_current_user
     current_user: User = Depends(get_current_user)
 ):
@@ -31,6 +40,197 @@ def log_history(
         quantity=data.units
     )
     db.add(entry)
-    db.commit()
-    db.refresh(entry)
-    return entry
\ No newline at end of file
+
+    # A newer donation moves the donor's eligibility forward, in the same
+    # transaction. Older back-dated entries leave the profile untouched.
+    profile = (await db.execute(
+        update(DonorProfile)
+        .where(
+            DonorProfile.user_id == current_user.id,
+            or_(DonorProfile.last_donation_date.is_(None), DonorProfile.last_donation_date < data.date),
+        )
+        .values(last_donation_date=data.date, next_eligible_date=next_eligible_date(data.date),
+                updated_at=db_clock())
+        .returning(DonorProfile)
+    )).scalar_one_or_none()
+    if profile is not None:
+        await drop_donor_matches(db, [profile.id])
+    else:
+        # The recent donation count still changed.
+        await db.execute(touch_donors([current_user.id]))
+
+    deltas = stock_deltas()
+    add_entry(deltas, data.date, data.blood_group, data.hospital, "donation", data.units)
+    await apply_stock_deltas(db, deltas)
+
+    await db.commit()
+    await db.refresh(entry)
+    if profile is not None:
+        donor_index.upsert(profile, current_user.full_name)
+        enqueue("donor", profile.id)
+        bump_tables("donor_profiles")
+    donor_index.record_donation(current_user.id, data.date)
+    bump_tables("donation_history")
+    invalidate_dashboard()
+    return entry
+
+def _import_format(request: Request, format: Optional[str]):
+    if format:
+        return format
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type or "json" in content_type:
+        return "ndjson"
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson.",
+    )
+
+@router.post("/batch", status_code=status.HTTP_201_CREATED)
+async def import_history_batch(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Rows: email, hospital, blood_group, date, units (default 1),
+    # entry_type (donation or received, default donation). See app/history_import.py.
+    # Rows for other donors' emails need an import role (admin, hospital).
+    report, profiles = await import_history(db, request.stream(), _import_format(request, format), current_user)
+
+    for profile in profiles:
+        donor_index.upsert(profile)
+    donor_index.add_recent_donations(report.recent_donations)
+    for profile in profiles:
+        enqueue("donor", profile.id)
+    if profiles:
+        bump_tables("donor_profiles")
+    if report.inserted:
+        bump_tables("donation_history")
+        invalidate_dashboard()
+    return {
+        "inserted": report.inserted,
+        "rejected": report.rejected,
+        "errors": report.errors,
+    }
+
+# --- READ: A DONOR'S RECORD ---
+# Donations and received units are paged separately, newest first, by
+# (date, id) keyset cursors of the form YYYY-MM-DD:id. Both pages come from
+# one UNION ALL over ix_donation_history_user_type_date.
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
+HISTORY_COLUMNS = (
+    DonationHistory.id,
+    DonationHistory.hospital,
+    DonationHistory.blood_group,
+    DonationHistory.date,
+    DonationHistory.entry_type,
+    DonationHistory.quantity,
+)
+
+def _parse_history_cursor(cursor: Optional[str]):
+    if cursor is None:
+        return None
+    try:
+        day, entry_id = cursor.split(":")
+        return date.fromisoformat(day), int(entry_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="History cursors look like YYYY-MM-DD:id.",
+        )
+
+def _history_page(user_id: int, entry_type: str, cursor, limit: int):
+    stmt = select(*HISTORY_COLUMNS).where(
+        DonationHistory.user_id == user_id, DonationHistory.entry_type == entry_type
+    )
+    if cursor is not None:
+        stmt = stmt.where(tuple_(DonationHistory.date, DonationHistory.id) < cursor)
+    return stmt.order_by(DonationHistory.date.desc(), DonationHistory.id.desc()).limit(limit + 1)
+
+def _split_page(rows, limit: int):
+    rows.sort(key=lambda row: (row.date, row.id), reverse=True)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return [row._asdict() for row in rows], f"{rows[-1].date.isoformat()}:{rows[-1].id}"
+    return [row._asdict() for row in rows], None
+
+@router.get("/", response_model=HistoryResponse, response_class=ORJSONResponse)
+async def read_history(
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=MAX_HISTORY_PAGE_SIZE),
+    donations_cursor: Optional[str] = None,
+    received_cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    stmt = union_all(
+        _history_page(current_user.id, "donation", _parse_history_cursor(donations_cursor), limit),
+        _history_page(current_user.id, "received", _parse_history_cursor(received_cursor), limit),
+    )
+    rows = (await db.execute(stmt)).all()
+
+    donations, next_donations = _split_page([r for r in rows if r.entry_type == "donation"], limit)
+    received, next_received = _split_page([r for r in rows if r.entry_type == "received"], limit)
+    return {
+        "donations": donations,
+        "received": received,
+        "next_donations_cursor": next_donations,
+        "next_received_cursor": next_received,
+    }
+
+# --- READ: MONTHLY SUMMARY ---
+# Per-month unit totals computed in SQL: FILTERed aggregates per month plus
+# window sums for the running totals, so the response has one row per month
+# however many entries the donor has. Windows run before LIMIT, so the
+# running totals stay correct when only the latest months are returned.
+SUMMARY_MONTHS = 24
+MAX_SUMMARY_MONTHS = 600
+
+def _summary_query(user_id: int, months: int):
+    month = cast(func.date_trunc("month", DonationHistory.date), Date).label("month")
+    donated = func.coalesce(func.sum(DonationHistory.quantity).filter(DonationHistory.entry_type == "donation"), 0)
+    received = func.coalesce(func.sum(DonationHistory.quantity).filter(DonationHistory.entry_type == "received"), 0)
+    entries = func.count(DonationHistory.id)
+    return (
+        select(
+            month,
+            entries.label("entries"),
+            donated.label("donated_units"),
+            received.label("received_units"),
+            func.sum(donated).over(order_by=month).label("cumulative_donated_units"),
+            func.sum(received).over(order_by=month).label("cumulative_received_units"),
+            func.sum(entries).over().label("total_entries"),
+        )
+        .where(DonationHistory.user_id == user_id)
+        .group_by(month)
+        .order_by(month.desc())
+        .limit(months)
+    )
+
+@router.get("/summary", response_model=HistorySummary, response_class=ORJSONResponse)
+async def read_history_summary(
+    months: int = Query(SUMMARY_MONTHS, ge=1, le=MAX_SUMMARY_MONTHS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    rows = (await db.execute(_summary_query(current_user.id, months))).all()
+    # The newest month's running totals are the lifetime totals.
+    latest = rows[0] if rows else None
+    return {
+        "total_entries": latest.total_entries if latest else 0,
+        "total_donated_units": latest.cumulative_donated_units if latest else 0,
+        "total_received_units": latest.cumulative_received_units if latest else 0,
+        "months": [
+            {
+                "month": row.month.strftime("%Y-%m"),
+                "entries": row.entries,
+                "donated_units": row.donated_units,
+                "received_units": row.received_units,
+                "cumulative_donated_units": row.cumulative_donated_units,
+                "cumulative_received_units": row.cumulative_received_units,
+            }
+            for row in rows
+        ],
+    }
@@ -0,0 +1,34 @@
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from app.database import get_async_engine
+from app.pool_metrics import pool_metrics
+from app.ratelimit import admission_stats
+
+router = APIRouter()
+
+LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+# Shared secret for the internal endpoints, sent as X-Internal-Token; unset
+# turns them off. The peer address alone proves nothing: behind ngrok every
+# public request also arrives from 127.0.0.1.
+INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN", "")
+PROXY_HEADERS = ("x-forwarded-for", "forwarded")
+
+# Internal endpoints are for operators on the box, not for the frontend.
+# Anything failing the check gets the same 404 as an unknown path.
+def require_local(request: Request):
+    local = request.client is not None and request.client.host in LOCAL_HOSTS
+    proxied = any(name in request.headers for name in PROXY_HEADERS)
+    token = request.headers.get("x-internal-token", "")
+    if not (INTERNAL_TOKEN and local and not proxied and hmac.compare_digest(token, INTERNAL_TOKEN)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+@router.get("/pool", dependencies=[Depends(require_local)])
+def pool_status():
+    return pool_metrics.snapshot(get_async_engine().pool)
+
+@router.get("/admission", dependencies=[Depends(require_local)])
+def admission_status():
+    return admission_stats.snapshot()
@@ -1,19 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import asyncio
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import and_, exists, func, join, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import List
-from datetime import datetime
+from typing import List, Optional
+from datetime import date, datetime, timedelta
 
 from app.database import get_db
-from app.models import RecipientRequest, DonorProfile, User
+from app.models import DonorProfile, RecipientRequest, RequestMatch, User
 # FIX: Import from app.auth instead of auth_routes
 from app.auth import get_current_user 
 
-# Import matching logic safely
-try:
-    from app.matching import find_matching_donors
-except ImportError:
-    find_matching_donors = None
+from app.batch_matching import match_open_requests
+from app.cache import bump_tables, invalidate_dashboard
+from app.etags import make_etag, not_modified, set_etag
+from app.geo import resolve_coordinates
+from app.match_worker import MATCHES_PER_REQUEST, enqueue, is_fresh, rank_request, valid_match
+from app.matching import DEFAULT_MATCH_RADIUS_KM, RECIPIENT_COMPATIBILITY, compatible_sql, donor_index
+from app.pagination import MAX_PAGE_SIZE, json_response, keyset_page, stream_ndjson
+from app.pubsub import get_broker, request_topics
+from app.schemas import RecipientRequestOut, RequestListItem
 
 router = APIRouter()
 
@@ -21,77 +30,352 @@ class RecipientRequestCreate(BaseModel):
     blood_group: str
     city: str
     urgency: str = "normal"
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+# How many ranked donors /matches/{id} returns.
+DEFAULT_MATCH_LIMIT = 20
+MAX_MATCH_LIMIT = 200
 
 @router.get("/me")
 # FIX: Use get_current_user here
 async def read_my_profile(current_user: User = Depends(get_current_user)):
     return {"message": "Recipient profile data", "user": {"id": current_user.id, "email": current_user.email}}
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=RecipientRequestOut,
+             response_class=ORJSONResponse)
 async def create_request(
     request_data: RecipientRequestCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     # FIX: Use get_current_user here
     current_user: User = Depends(get_current_user)
 ):
+    latitude, longitude = resolve_coordinates(request_data.city, request_data.latitude, request_data.longitude)
     new_request = RecipientRequest(
         user_id=current_user.id,
         blood_group=request_data.blood_group,
         city=request_data.city,
         urgency=request_data.urgency,
-        created_at=datetime.now()
+        created_at=datetime.now(),
+        latitude=latitude,
+        longitude=longitude,
     )
     
     db.add(new_request)
-    db.commit()
-    db.refresh(new_request)
+    await db.commit()
+    await db.refresh(new_request)
+    bump_tables("recipient_requests")
+    invalidate_dashboard()
+    enqueue("request", new_request.id)
+    await get_broker().publish(request_topics(new_request.city, new_request.blood_group), {
+        "id": new_request.id,
+        "patient_name": current_user.full_name,
+        "blood_group": new_request.blood_group,
+        "city": new_request.city,
+        "urgency": new_request.urgency,
+        "created_at": new_request.created_at.strftime("%Y-%m-%d") if new_request.created_at else "Recently",
+    })
     
     return new_request
 
-@router.get("/all")
-def get_all_requests(db: Session = Depends(get_db)):
-    requests = db.query(RecipientRequest).join(User).filter(RecipientRequest.fulfilled == False).all()
-    
-    return [
-        {
-            "id": r.id,
-            "patient_name": r.user.full_name,
-            "blood_group": r.blood_group,
-            "city": r.city,
-            "urgency": r.urgency,
-            "created_at": r.created_at.strftime("%Y-%m-%d") if r.created_at else "Recently"
-        }
-        for r in requests
-    ]
+# Columns of RequestListItem, fetched as tuples.
+REQUEST_LIST_COLUMNS = (
+    RecipientRequest.id,
+    User.full_name.label("patient_name"),
+    RecipientRequest.blood_group,
+    RecipientRequest.city,
+    RecipientRequest.urgency,
+    RecipientRequest.created_at,
+)
+
+def _open_request_query(city: Optional[str], blood_group: Optional[str], urgency: Optional[str]):
+    stmt = (
+        select(*REQUEST_LIST_COLUMNS)
+        .join(User, RecipientRequest.user_id == User.id)
+        .where(RecipientRequest.fulfilled == False)
+    )
+    if city:
+        stmt = stmt.where(func.lower(RecipientRequest.city) == city.strip().lower())
+    if blood_group:
+        stmt = stmt.where(RecipientRequest.blood_group == blood_group)
+    if urgency:
+        stmt = stmt.where(RecipientRequest.urgency == urgency)
+    return stmt
+
+def _request_item(row):
+    item = row._asdict()
+    if item["created_at"] is None:
+        item["created_at"] = "Recently"
+    return item
+
+# Tables /recipient/all reads; their versions make up its ETag.
+REQUEST_LIST_TABLES = ("recipient_requests", "users")
+
+@router.get("/all", response_model=List[RequestListItem], response_class=ORJSONResponse)
+async def get_all_requests(
+    request: Request,
+    response: Response,
+    # Omit both limit and cursor for the whole list; see app/pagination.py.
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+    city: Optional[str] = None,
+    blood_group: Optional[str] = None,
+    urgency: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    etag = make_etag(request, REQUEST_LIST_TABLES)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+
+    stmt = _open_request_query(city, blood_group, urgency)
+    if format == "ndjson":
+        if cursor is not None:
+            stmt = stmt.where(RecipientRequest.id > cursor)
+        streamed = stream_ndjson(stmt.order_by(RecipientRequest.id), _request_item)
+        set_etag(streamed, etag)
+        return streamed
+
+    rows = await keyset_page(db, stmt, RecipientRequest.id, cursor, limit, response)
+    set_etag(response, etag)
+    return json_response([_request_item(row) for row in rows], response)
+
+@router.get("/matches")
+async def get_batch_matches(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # One donor per open, unclaimed request, no donor suggested twice; see app/batch_matching.py.
+    rows = (await db.execute(
+        select(RecipientRequest.id, RecipientRequest.blood_group, RecipientRequest.city,
+               RecipientRequest.urgency, RecipientRequest.created_at)
+        .where(_claimable(datetime.now()))
+    )).all()
+    assignments, unassigned = await asyncio.to_thread(match_open_requests, rows)
+    return {
+        "open_requests": len(rows),
+        "assigned": len(assignments),
+        "assignments": assignments,
+        "unassigned": unassigned,
+    }
+
+def _materialized_matches(request_id: int, limit: int):
+    # The request and its top rows in one read; a request with no rows yet
+    # still comes back once, with NULL match columns. Rows whose donor no
+    # longer matches (not eligible yet, group or city changed) are left out
+    # by the join condition until the worker drops them.
+    rows = (
+        join(RequestMatch, DonorProfile, DonorProfile.id == RequestMatch.donor_id)
+        .join(User, User.id == DonorProfile.user_id)
+    )
+    return (
+        select(
+            RecipientRequest.blood_group, RecipientRequest.city, RecipientRequest.latitude,
+            RecipientRequest.longitude, RecipientRequest.fulfilled, RecipientRequest.matched_at,
+            RequestMatch.donor_id, RequestMatch.score, RequestMatch.distance_km,
+            User.full_name, DonorProfile.blood_group.label("donor_blood_group"),
+            DonorProfile.city.label("donor_city"), DonorProfile.last_donation_date,
+        )
+        .select_from(RecipientRequest)
+        .outerjoin(rows, valid_match(date.today()))
+        .where(RecipientRequest.id == request_id)
+        .order_by(RequestMatch.score.desc().nulls_last(), RequestMatch.donor_id.desc())
+        .limit(limit)
+    )
+
+def _materialized_item(row):
+    # Same shape as app.matching._project.
+    item = {
+        "id": row.donor_id,
+        "name": row.full_name,
+        "blood_group": row.donor_blood_group,
+        "city": row.donor_city,
+        "last_donation_date": row.last_donation_date,
+        "score": row.score,
+    }
+    if row.distance_km is not None:
+        item["distance_km"] = row.distance_km
+    return item
 
 @router.get("/matches/{request_id}")
 async def get_matches(
     request_id: int,
-    db: Session = Depends(get_db),
+    radius_km: float = Query(DEFAULT_MATCH_RADIUS_KM, gt=0, le=1000),
+    limit: int = Query(DEFAULT_MATCH_LIMIT, ge=1, le=MAX_MATCH_LIMIT),
+    db: AsyncSession = Depends(get_db),
     # FIX: Use get_current_user here
     current_user: User = Depends(get_current_user)
 ):
-    request = db.query(RecipientRequest).filter(RecipientRequest.id == request_id).first()
-    
-    if not request:
-        raise HTTPException(status_code=404, detail="Request not found")
-    
-    matches = []
-    if find_matching_donors:
-        donors = db.query(DonorProfile).join(User).all()
-        matches = find_matching_donors(donors, request.blood_group, request.city)
+    # The `limit` best-scored donors, best first. Requests with coordinates
+    # rank the closest compatible donors within radius_km (any city); the
+    # rest fall back to same-city matching. With the default radius the
+    # answer is read from request_matches (app/match_worker.py) while its
+    # rows are fresh; otherwise (and once fulfilled) it is ranked from the
+    # donor index.
+    materialized = radius_km == DEFAULT_MATCH_RADIUS_KM and limit <= MATCHES_PER_REQUEST
+    if materialized:
+        rows = (await db.execute(_materialized_matches(request_id, limit))).all()
+        if not rows:
+            raise HTTPException(status_code=404, detail="Request not found")
+        request = rows[0]
+        if is_fresh(request.matched_at):
+            matches = [_materialized_item(row) for row in rows if row.score is not None]
+        else:
+            # Fulfilled requests have no rows and are not refreshed.
+            if not request.fulfilled:
+                enqueue("request", request_id)
+            matches = rank_request(request.blood_group, request.city, request.latitude, request.longitude, limit)
+    else:
+        request = await db.get(RecipientRequest, request_id)
+        if not request:
+            raise HTTPException(status_code=404, detail="Request not found")
+        if request.latitude is not None and request.longitude is not None:
+            matches = donor_index.nearest(request.blood_group, request.latitude, request.longitude, limit, radius_km)
+        else:
+            matches = donor_index.match(request.blood_group, request.city, limit)
     
     return {
         "request_id": request_id,
         "blood_group": request.blood_group,
         "city": request.city,
-        "matches": [
-            {
-                "id": d.id,
-                "name": d.user.full_name,
-                "blood_group": d.blood_group,
-                "city": d.city,
-                "last_donation_date": d.last_donation_date
-            } for d in matches
-        ]
-    }
\ No newline at end of file
+        "matches": matches
+    }
+# --- CLAIM AND FULFILL ---
+# Each transition is a single UPDATE whose target row is picked by a
+# SELECT ... FOR UPDATE SKIP LOCKED subquery. Concurrent claimers of the same
+# request never wait on each other: the one holding the row lock wins and
+# the rest find no row and get 409 at once. The follow-up read only runs on
+# that failure path, to choose between 404, 403 and 409.
+CLAIM_TTL = timedelta(minutes=int(os.getenv("CLAIM_TTL_MINUTES", "120")))
+
+def _claimable(now: datetime):
+    return and_(
+        RecipientRequest.fulfilled == False,
+        or_(RecipientRequest.claimed_by.is_(None), RecipientRequest.claimed_at < now - CLAIM_TTL),
+    )
+
+def _holds_claim(user_id: int, now: datetime):
+    return and_(RecipientRequest.claimed_by == user_id, RecipientRequest.claimed_at >= now - CLAIM_TTL)
+
+def _claim_expired(request: RecipientRequest, now: datetime):
+    return request.claimed_by is None or request.claimed_at is None or request.claimed_at < now - CLAIM_TTL
+
+async def _transition(db: AsyncSession, request_id: int, condition, values: dict):
+    target = (
+        select(RecipientRequest.id)
+        .where(RecipientRequest.id == request_id, condition)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(RecipientRequest)
+        .where(RecipientRequest.id == target)
+        .values(**values)
+        .returning(RecipientRequest)
+        .execution_options(synchronize_session=False)
+    )
+    updated = (await db.execute(stmt)).scalar_one_or_none()
+    await db.commit()
+    return updated
+
+async def _existing_or_404(db: AsyncSession, request_id: int):
+    existing = await db.get(RecipientRequest, request_id, populate_existing=True)
+    if existing is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Request not found")
+    return existing
+
+def _conflict(detail: str):
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+@router.post("/{request_id}/claim", response_model=RecipientRequestOut, response_class=ORJSONResponse)
+async def claim_request(
+    request_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    now = datetime.now()
+    # Only donors whose group can give to the request, and not its requester,
+    # can claim; checked inside the UPDATE so it costs no extra round trip.
+    can_give = exists().where(
+        DonorProfile.user_id == current_user.id,
+        compatible_sql(RecipientRequest.blood_group, DonorProfile.blood_group),
+    )
+    condition = and_(_claimable(now), RecipientRequest.user_id != current_user.id, can_give)
+    claimed = await _transition(db, request_id, condition, {"claimed_by": current_user.id, "claimed_at": now})
+    if claimed is not None:
+        return claimed
+
+    existing = await _existing_or_404(db, request_id)
+    if existing.fulfilled:
+        raise _conflict("Request is already fulfilled.")
+    if existing.user_id == current_user.id:
+        raise _conflict("You cannot claim your own request.")
+    donor_group = (await db.execute(
+        select(DonorProfile.blood_group).where(DonorProfile.user_id == current_user.id)
+    )).scalar_one_or_none()
+    if donor_group is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Create a donor profile before claiming requests.",
+        )
+    if donor_group not in RECIPIENT_COMPATIBILITY.get(existing.blood_group, ()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"{donor_group} donors cannot give to a {existing.blood_group} request.",
+        )
+    if existing.claimed_by == current_user.id and not _claim_expired(existing, now):
+        return existing  # claiming twice is not an error
+    if _claim_expired(existing, now):
+        # Free to claim, so the row was locked by a concurrent release or fulfill.
+        raise _conflict("Request is being updated; try again.")
+    raise _conflict("Request is already claimed by another donor.")
+
+@router.post("/{request_id}/release", response_model=RecipientRequestOut, response_class=ORJSONResponse)
+async def release_request(
+    request_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    condition = and_(RecipientRequest.fulfilled == False, RecipientRequest.claimed_by == current_user.id)
+    released = await _transition(db, request_id, condition, {"claimed_by": None, "claimed_at": None})
+    if released is not None:
+        return released
+
+    existing = await _existing_or_404(db, request_id)
+    if existing.fulfilled:
+        raise _conflict("Request is already fulfilled.")
+    if existing.claimed_by != current_user.id:
+        raise _conflict("Request is not claimed by you.")
+    raise _conflict("Request is being updated; try again.")
+
+@router.post("/{request_id}/fulfill", response_model=RecipientRequestOut, response_class=ORJSONResponse)
+async def fulfill_request(
+    request_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # The donor holding an unexpired claim, or the requester, can close a request.
+    now = datetime.now()
+    condition = and_(
+        RecipientRequest.fulfilled == False,
+        or_(_holds_claim(current_user.id, now), RecipientRequest.user_id == current_user.id),
+    )
+    fulfilled = await _transition(db, request_id, condition, {"fulfilled": True, "fulfilled_at": now, "matched_at": None})
+    if fulfilled is not None:
+        bump_tables("recipient_requests")
+        invalidate_dashboard()
+        enqueue("request", request_id)
+        return fulfilled
+
+    existing = await _existing_or_404(db, request_id)
+    if existing.fulfilled:
+        raise _conflict("Request is already fulfilled.")
+    if existing.user_id != current_user.id and existing.claimed_by == current_user.id and _claim_expired(existing, now):
+        raise _conflict("Your claim has expired; claim the request again.")
+    if current_user.id not in (existing.claimed_by, existing.user_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the donor who claimed the request or the requester can fulfill it.",
+        )
+    raise _conflict("Request is being updated; try again.")
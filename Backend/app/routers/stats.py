@@ -1,57 +1,227 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import JSON, Date, cast, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from datetime import date, datetime, timedelta
 
 from app.database import get_db
-from app.models import User, DonorProfile, RecipientRequest, DonationHistory
+from app.models import User, DonorProfile, RecipientRequest, DonationHistory, BloodStockRollup
 # FIX: Import correctly from app.auth
 from app.auth import get_current_user
+from app.cache import dashboard_cache
+from app.etags import make_etag, not_modified, set_etag
+from app.matching import BLOOD_COMPATIBILITY
+from app.stock import STOCK_SHELF_LIFE_DAYS
 
 router = APIRouter()
 
-@router.get("/dashboard")
-def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    # FIX: Use get_current_user
-    current_user: User = Depends(get_current_user)
-):
+EMPTY_JSON_ARRAY = literal_column("'[]'::json")
+
+def _dashboard_query(last_month, today):
+    # Every aggregate is a scalar subquery or CTE of one SELECT, so the whole
+    # dashboard is a single round trip. Lists come back as JSON arrays.
+
     # 1. Total Donors (Count donor profiles)
-    total_donors = db.query(DonorProfile).count()
+    total_donors = select(func.count(DonorProfile.id)).scalar_subquery()
 
     # 2. Pending Requests (Unfulfilled requests)
-    pending_requests = db.query(RecipientRequest).filter(RecipientRequest.fulfilled == False).count()
+    pending_requests = (
+        select(func.count(RecipientRequest.id))
+        .where(RecipientRequest.fulfilled == False)
+        .scalar_subquery()
+    )
 
     # 3. Recent Donations (Donations in last 30 days)
-    last_month = datetime.now().date() - timedelta(days=30)
-    recent_donations = db.query(DonationHistory).filter(
-        DonationHistory.entry_type == "donation",
-        DonationHistory.date >= last_month
-    ).count()
-
-    # 4. Blood Stock Levels (Count of Donors by Blood Group)
-    stock_query = db.query(
-        DonorProfile.blood_group, func.count(DonorProfile.id)
-    ).group_by(DonorProfile.blood_group).all()
-    
-    stock_levels = [{"group": row[0], "units": row[1]} for row in stock_query]
+    recent_donations = (
+        select(func.count(DonationHistory.id))
+        .where(DonationHistory.entry_type == "donation", DonationHistory.date >= last_month)
+        .scalar_subquery()
+    )
+
+    # 3b. Donors eligible to donate today (indexed on next_eligible_date)
+    eligible_donors = (
+        select(func.count(DonorProfile.id))
+        .where(or_(DonorProfile.next_eligible_date.is_(None), DonorProfile.next_eligible_date <= today))
+        .scalar_subquery()
+    )
+
+    # 4. Blood Stock Levels (units in minus units out over the shelf life, from the rollup)
+    stock = (
+        select(
+            BloodStockRollup.blood_group.label("grp"),
+            func.greatest(
+                func.sum(BloodStockRollup.donated_units - BloodStockRollup.received_units), 0
+            ).label("units"),
+        )
+        .where(BloodStockRollup.date > today - timedelta(days=STOCK_SHELF_LIFE_DAYS))
+        .group_by(BloodStockRollup.blood_group)
+        .cte("stock")
+    )
+    stock_levels = select(
+        func.coalesce(
+            func.json_agg(func.json_build_object(
+                literal_column("'group'"), stock.c.grp,
+                literal_column("'units'"), stock.c.units,
+            )),
+            EMPTY_JSON_ARRAY,
+            type_=JSON,
+        )
+    ).scalar_subquery()
 
     # 5. Recent Activity Feed (Last 5 actions)
-    recent_activity = db.query(DonationHistory).order_by(DonationHistory.date.desc()).limit(5).all()
-    formatted_activity = [
-        {
-            "donor": entry.user.full_name if entry.user else "Unknown",
-            "group": entry.blood_group,
-            "city": entry.hospital, 
-            "time": entry.date.strftime("%Y-%m-%d")
-        }
-        for entry in recent_activity
-    ]
+    activity = (
+        select(
+            func.coalesce(User.full_name, "Unknown").label("donor"),
+            DonationHistory.blood_group,
+            DonationHistory.hospital,
+            DonationHistory.date,
+        )
+        .outerjoin(User, DonationHistory.user_id == User.id)
+        .order_by(DonationHistory.date.desc())
+        .limit(5)
+        .cte("activity")
+    )
+    recent_activity = select(
+        func.coalesce(
+            func.json_agg(aggregate_order_by(
+                func.json_build_object(
+                    literal_column("'donor'"), activity.c.donor,
+                    literal_column("'group'"), activity.c.blood_group,
+                    literal_column("'city'"), activity.c.hospital,
+                    literal_column("'time'"), activity.c.date,
+                ),
+                activity.c.date.desc(),
+            )),
+            EMPTY_JSON_ARRAY,
+            type_=JSON,
+        )
+    ).scalar_subquery()
+
+    return select(
+        total_donors.label("total_donors"),
+        pending_requests.label("pending_requests"),
+        recent_donations.label("recent_donations_count"),
+        eligible_donors.label("eligible_donors"),
+        stock_levels.label("stock_levels"),
+        recent_activity.label("recent_activity"),
+    )
 
+# Tables the dashboard reads; their versions and the date make up its ETag.
+DASHBOARD_TABLES = ("donor_profiles", "recipient_requests", "donation_history", "users")
+
+@router.get("/dashboard")
+async def get_dashboard_stats(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    # FIX: Use get_current_user
+    current_user: User = Depends(get_current_user)
+):
+    # Eligibility and the 30-day window move with the date, so it is part of the ETag.
+    etag = make_etag(request, DASHBOARD_TABLES, datetime.now().date())
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    set_etag(response, etag)
+
+    cached = dashboard_cache.get("dashboard")
+    if cached is not None:
+        return cached
+
+    # Writes that land while we query clear the cache; don't store a stale result.
+    generation = dashboard_cache.generation
+    today = datetime.now().date()
+    last_month = today - timedelta(days=30)
+    row = (await db.execute(_dashboard_query(last_month, today))).one()
+
+    stats = {
+        "total_donors": row.total_donors,
+        "pending_requests": row.pending_requests,
+        "recent_donations_count": row.recent_donations_count,
+        "eligible_donors": row.eligible_donors,
+        "stock_levels": row.stock_levels,
+        "recent_activity": row.recent_activity
+    }
+    dashboard_cache.set("dashboard", stats, generation=generation)
+    return stats
+
+# --- STOCK AND TRENDS ---
+# Both read blood_stock_rollup: one row per day, group and hospital, so any
+# date range costs a range scan over its primary key, never a history scan.
+TREND_DAYS = 90
+
+def _date_range(start: Optional[date], end: Optional[date], default_days: int):
+    end = end or datetime.now().date()
+    start = start or end - timedelta(days=default_days - 1)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end.")
+    return start, end
+
+def _rollup_filter(stmt, start, end, hospital):
+    stmt = stmt.where(BloodStockRollup.date >= start, BloodStockRollup.date <= end)
+    if hospital:
+        stmt = stmt.where(BloodStockRollup.hospital == hospital)
+    return stmt
+
+@router.get("/stock")
+async def get_stock(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    hospital: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Defaults to the shelf-life window ending today.
+    start, end = _date_range(start, end, STOCK_SHELF_LIFE_DAYS)
+    stmt = _rollup_filter(
+        select(
+            BloodStockRollup.blood_group,
+            func.sum(BloodStockRollup.donated_units).label("donated"),
+            func.sum(BloodStockRollup.received_units).label("received"),
+        ),
+        start, end, hospital,
+    ).group_by(BloodStockRollup.blood_group)
+    totals = {row.blood_group: row for row in (await db.execute(stmt)).all()}
+
+    stock = []
+    for group in BLOOD_COMPATIBILITY:
+        row = totals.get(group)
+        donated, received = (int(row.donated), int(row.received)) if row else (0, 0)
+        stock.append({"group": group, "donated_units": donated, "received_units": received,
+                      "units": donated - received})
+    return {"start": start, "end": end, "hospital": hospital, "stock": stock}
+
+@router.get("/trend")
+async def get_trend(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: str = Query("week", pattern="^(day|week|month)$"),
+    blood_group: Optional[str] = None,
+    hospital: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    start, end = _date_range(start, end, TREND_DAYS)
+    period = cast(func.date_trunc(bucket, BloodStockRollup.date), Date).label("period")
+    stmt = _rollup_filter(
+        select(
+            period,
+            func.sum(BloodStockRollup.donated_units).label("donated"),
+            func.sum(BloodStockRollup.received_units).label("received"),
+        ),
+        start, end, hospital,
+    )
+    if blood_group:
+        stmt = stmt.where(BloodStockRollup.blood_group == blood_group)
+    rows = (await db.execute(stmt.group_by(period).order_by(period))).all()
     return {
-        "total_donors": total_donors,
-        "pending_requests": pending_requests,
-        "recent_donations_count": recent_donations,
-        "stock_levels": stock_levels,
-        "recent_activity": formatted_activity
-    }
\ No newline at end of file
+        "start": start,
+        "end": end,
+        "bucket": bucket,
+        "blood_group": blood_group,
+        "points": [
+            {"period": row.period, "donated_units": int(row.donated), "received_units": int(row.received)}
+            for row in rows
+        ],
+    }
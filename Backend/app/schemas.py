@@ -1,5 +1,5 @@
-from datetime import date
-from typing import Optional, List
+from datetime import date, datetime
+from typing import Literal, Optional, List, Union
 from pydantic import BaseModel, EmailStr
 
 # --- Token Schemas ---
@@ -46,27 +46,87 @@ class UserProfileUpdate(BaseModel):
 # --- Donor Schemas ---
 class DonorListItem(BaseModel):
     id: int
-    full_name: str
-    email: str
+    full_name: Optional[str] = None
+    email: Optional[str] = None
+    phone_number: Optional[str] = None
     blood_group: str
     city: str
-    age: int
-    last_donation_date: Optional[date] = None
+    age: Optional[int] = None
+    last_donation_date: Union[date, Literal["Never"]] = "Never"
 
     class Config:
         from_attributes = True  # <--- FIX: Renamed from orm_mode
 
+class DonorProfileOut(BaseModel):
+    id: int
+    user_id: int
+    blood_group: str
+    city: str
+    age: Optional[int] = None
+    last_donation_date: Optional[date] = None
+    next_eligible_date: Optional[date] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+# --- Recipient Request Schemas ---
+class RequestListItem(BaseModel):
+    id: int
+    patient_name: Optional[str] = None
+    blood_group: str
+    city: str
+    urgency: str
+    created_at: Union[date, Literal["Recently"]] = "Recently"
+
+class RecipientRequestOut(BaseModel):
+    id: int
+    user_id: int
+    blood_group: str
+    city: str
+    urgency: str
+    fulfilled: bool
+    created_at: Optional[date] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    claimed_by: Optional[int] = None
+    claimed_at: Optional[datetime] = None
+    fulfilled_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 # --- History Schemas ---
 class HistoryEntry(BaseModel):
     id: int
-    hospital: str
-    blood_group: str
+    hospital: Optional[str] = None
+    blood_group: Optional[str] = None
     date: date
     entry_type: str
+    quantity: int = 1
 
     class Config:
         from_attributes = True  # <--- FIX: Renamed from orm_mode
 
 class HistoryResponse(BaseModel):
     donations: List[HistoryEntry]
-    received: List[HistoryEntry]
\ No newline at end of file
+    received: List[HistoryEntry]
+    # Pass back as ?donations_cursor= / ?received_cursor= for the next page.
+    next_donations_cursor: Optional[str] = None
+    next_received_cursor: Optional[str] = None
+
+class HistoryMonth(BaseModel):
+    month: str  # YYYY-MM
+    entries: int
+    donated_units: int
+    received_units: int
+    # Running totals from the donor's first entry up to and including this month.
+    cumulative_donated_units: int
+    cumulative_received_units: int
+
+class HistorySummary(BaseModel):
+    total_entries: int
+    total_donated_units: int
+    total_received_units: int
+    months: List[HistoryMonth]
\ No newline at end of file
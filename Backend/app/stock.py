@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import UPSERT_BATCH_ROWS
+from .models import BloodStockRollup
+
+# --- BLOOD STOCK ROLLUP ---
+# blood_stock_rollup holds donated and received units per (date, blood
+# group, hospital). Writes to donation_history add their units here in the
+# same transaction, so stock and trend queries read rollup rows instead of
+# scanning history. rebuild_stock_rollup.py recomputes it from scratch.
+
+# Red cells keep for 42 days; stock is what came in minus what went out
+# over that window.
+STOCK_SHELF_LIFE_DAYS = 42
+
+REBUILD_SQL = """
+    INSERT INTO blood_stock_rollup (date, blood_group, hospital, donated_units, received_units)
+    SELECT date, blood_group, COALESCE(hospital, ''),
+           COALESCE(SUM(quantity) FILTER (WHERE entry_type = 'donation'), 0),
+           COALESCE(SUM(quantity) FILTER (WHERE entry_type = 'received'), 0)
+    FROM donation_history
+    WHERE date IS NOT NULL AND blood_group IS NOT NULL
+    GROUP BY date, blood_group, COALESCE(hospital, '')
+    ON CONFLICT (date, blood_group, hospital) DO UPDATE
+    SET donated_units = EXCLUDED.donated_units, received_units = EXCLUDED.received_units
+"""
+
+
+def rebuild_rollup(conn):
+    """Recompute the rollup from donation_history on a sync connection; returns the row count."""
+    # DELETE, not TRUNCATE: TRUNCATE takes an ACCESS EXCLUSIVE lock that would
+    # block the dashboard, stock reads and history writes for the whole
+    # rebuild. With DELETE, readers keep seeing the old rows until commit and
+    # concurrent upserts wait only on the rows they touch. A history write
+    # committed between the two statements may insert a key the DELETE never
+    # saw; the INSERT's snapshot already includes that entry, so ON CONFLICT
+    # overwrites the row with the full totals.
+    conn.execute(text("DELETE FROM blood_stock_rollup"))
+    conn.execute(text(REBUILD_SQL))
+    return conn.execute(text("SELECT count(*) FROM blood_stock_rollup")).scalar()
+
+
+def stock_deltas():
+    """An empty accumulator for add_entry()."""
+    return defaultdict(lambda: [0, 0])
+
+
+def add_entry(deltas, entry_date, blood_group, hospital, entry_type, units):
+    delta = deltas[(entry_date, blood_group, hospital or "")]
+    delta[0 if entry_type == "donation" else 1] += units or 0
+
+
+async def apply_stock_deltas(db: AsyncSession, deltas):
+    # One statement may not update the same row twice, so deltas are summed
+    # per key (by add_entry) before the upsert.
+    if not deltas:
+        return
+    stmt = insert(BloodStockRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BloodStockRollup.date, BloodStockRollup.blood_group, BloodStockRollup.hospital],
+        set_={
+            "donated_units": BloodStockRollup.donated_units + stmt.excluded.donated_units,
+            "received_units": BloodStockRollup.received_units + stmt.excluded.received_units,
+        },
+    )
+    rows = [
+        {"date": day, "blood_group": group, "hospital": hospital, "donated_units": donated, "received_units": received}
+        for (day, group, hospital), (donated, received) in deltas.items()
+    ]
+    for start in range(0, len(rows), UPSERT_BATCH_ROWS):
+        await db.execute(stmt.values(rows[start:start + UPSERT_BATCH_ROWS]))
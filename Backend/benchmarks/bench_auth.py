@@ -0,0 +1,51 @@
+"""Authenticated-request throughput benchmark.
+
+Hammers GET /auth/profile, the cheapest protected endpoint, so the cost
+measured is mostly get_current_user:
+
+    python -m benchmarks.bench_auth --concurrency 50 --requests 5000 --out auth.json
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from benchmarks.common import BASE_URL, bench_token, compare_results, run_load, save_results, summarize
+
+
+async def bench(args):
+    async with httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        with httpx.Client() as setup:
+            headers = bench_token(setup, args.base_url)
+        url = f"{args.base_url}/auth/profile"
+        await run_load(lambda: client.get(url, headers=headers), args.concurrency, args.concurrency)
+        latencies, elapsed, errors = await run_load(
+            lambda: client.get(url, headers=headers), args.requests, args.concurrency
+        )
+    return {"GET /auth/profile": summarize(latencies, elapsed, errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare, metrics=("throughput_rps", "p50_ms", "p99_ms"))
+        return
+
+    results = asyncio.run(bench(args))
+    stats = results["GET /auth/profile"]
+    print(f"📈 {args.label}: {stats['throughput_rps']} req/s, p50 {stats['p50_ms']} ms, "
+          f"p99 {stats['p99_ms']} ms, {stats['errors']} errors")
+    if args.out:
+        save_results(args.out, args.label, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Batch matching solver benchmark.
+
+Runs app.batch_matching.solve in-process on a synthetic donor index and
+request set, so it needs no database or server:
+
+    python -m benchmarks.bench_batch_matching --donors 1000000 --requests 10000
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from app.batch_matching import BLOOD_GROUPS, URGENCY_RANK, solve
+from app.matching import DonorIndex, next_eligible_date
+from benchmarks.common import save_results
+
+CITIES = ["Lahore", "Karachi", "Islamabad", "Peshawar", "Quetta", "Multan", "Faisalabad"]
+
+
+def synthetic_index(donors, rng, today):
+    rows = []
+    for donor_id in range(1, donors + 1):
+        last = today - timedelta(days=rng.randint(30, 500))
+        rows.append((donor_id, donor_id, f"Donor {donor_id}", rng.choice(BLOOD_GROUPS), rng.choice(CITIES),
+                     last, None, None, next_eligible_date(last), rng.randint(0, 4)))
+    index = DonorIndex()
+    index.build(rows)
+    return index
+
+
+def synthetic_requests(count, rng, today):
+    urgencies = list(URGENCY_RANK)
+    return [
+        (request_id, rng.choice(BLOOD_GROUPS), rng.choice(CITIES), rng.choice(urgencies),
+         today - timedelta(days=rng.randint(0, 5)))
+        for request_id in range(1, count + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--donors", type=int, default=1000000)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    rng, today = random.Random(args.seed), date.today()
+    print(f"🌱 Building index with {args.donors} donors...")
+    index = synthetic_index(args.donors, rng, today)
+    requests = synthetic_requests(args.requests, rng, today)
+
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        assignments, unassigned = solve(requests, index.eligible_buckets(today), today)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"📈 {args.label}: {len(assignments)} assigned, {len(unassigned)} unassigned; "
+          f"best {min(timings):.0f} ms, worst {max(timings):.0f} ms")
+
+    if args.out:
+        save_results(args.out, args.label, {"solve": {
+            "donors": args.donors, "requests": args.requests,
+            "best_ms": round(min(timings), 2), "worst_ms": round(max(timings), 2),
+        }})
+
+
+if __name__ == "__main__":
+    main()
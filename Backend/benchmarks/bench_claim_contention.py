@@ -0,0 +1,101 @@
+"""Claim contention benchmark.
+
+Creates --requests open requests, then has --claimers distinct donors try
+to claim every one of them at the same time. Checks that each request ends
+up with exactly one winner (everyone else must get 409) and reports claim
+latency and throughput:
+
+    python -m benchmarks.bench_claim_contention --claimers 300 --requests 20 --out claims.json
+
+Claimer accounts (bench-claimer-N@example.com) are created on first use,
+with the donor profile claiming requires.
+"""
+import argparse
+import asyncio
+import random
+import sys
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.common import BASE_URL, bench_token, run_load, save_results, summarize
+
+
+def claimer(i):
+    return {
+        "full_name": f"Claimer {i}",
+        "email": f"bench-claimer-{i}@example.com",
+        "password": "bench-password-123",
+        "role": "donor",
+        "blood_group": "O-",
+        "city": "Lahore",
+    }
+
+
+async def run(args):
+    with httpx.Client(timeout=60) as setup:
+        owner = bench_token(setup, args.base_url)
+        print(f"🔑 Logging in {args.claimers} claimers...")
+        tokens = [bench_token(setup, args.base_url, claimer(i)) for i in range(args.claimers)]
+        for headers in tokens:
+            setup.post(f"{args.base_url}/donor/", headers=headers,
+                       json={"blood_group": "O-", "city": "Lahore", "age": 30}).raise_for_status()
+        request_ids = []
+        for _ in range(args.requests):
+            res = setup.post(f"{args.base_url}/recipient/", headers=owner,
+                             json={"blood_group": "O-", "city": "Lahore", "urgency": "critical"})
+            res.raise_for_status()
+            request_ids.append(res.json()["id"])
+
+    # Every (claimer, request) pair once, shuffled so requests are hit in parallel.
+    attempts = [(c, r) for r in request_ids for c in range(args.claimers)]
+    random.Random(args.seed).shuffle(attempts)
+    pending = iter(attempts)
+    winners = defaultdict(set)
+    unexpected = []
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        async def send():
+            c, request_id = next(pending)
+            res = await client.post(f"{args.base_url}/recipient/{request_id}/claim", headers=tokens[c])
+            if res.status_code == 200:
+                winners[request_id].add(res.json()["claimed_by"])
+            elif res.status_code != 409:
+                unexpected.append(res.status_code)
+            return res
+
+        latencies, elapsed, _ = await run_load(send, len(attempts), args.concurrency)
+
+    # 409 is the expected answer for every loser, so only other failures count as errors.
+    stats = summarize(latencies, elapsed, len(unexpected))
+    double = sum(1 for ids in winners.values() if len(ids) > 1)
+    unclaimed = sum(1 for r in request_ids if not winners[r])
+    stats.update({"double_assigned": double, "unclaimed": unclaimed, "unexpected_status": len(unexpected)})
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--claimers", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    stats = asyncio.run(run(args))
+    ok = stats["double_assigned"] == 0 and stats["unclaimed"] == 0 and stats["unexpected_status"] == 0
+    print(f"{'✅' if ok else '❌'} {args.label}: {stats['throughput_rps']} claims/s, p50 {stats['p50_ms']} ms, "
+          f"p99 {stats['p99_ms']} ms; {stats['double_assigned']} double-assigned, "
+          f"{stats['unclaimed']} unclaimed, {stats['unexpected_status']} unexpected responses")
+    if args.out:
+        save_results(args.out, args.label, {"POST /recipient/{id}/claim": stats})
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
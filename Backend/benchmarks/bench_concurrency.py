@@ -0,0 +1,51 @@
+"""Concurrency benchmark.
+
+Drives a mix of read endpoints at increasing client counts and reports
+throughput and latency at each level, to show the server keeps scaling
+past 100 concurrent clients instead of serializing on blocking DB calls:
+
+    python -m benchmarks.bench_concurrency --levels 1 10 50 100 200 --out concurrency.json
+"""
+import argparse
+import asyncio
+import itertools
+
+import httpx
+
+from benchmarks.common import BASE_URL, bench_token, run_load, save_results, summarize
+
+MIXED_PATHS = ["/recipient/all?limit=50", "/donor/all?limit=50", "/stats/dashboard", "/auth/profile"]
+
+
+async def level(args, headers, concurrency):
+    paths = itertools.cycle(MIXED_PATHS)
+    async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=concurrency)) as client:
+        send = lambda: client.get(args.base_url + next(paths), headers=headers)  # noqa: E731
+        latencies, elapsed, errors = await run_load(send, args.requests_per_client * concurrency, concurrency)
+    return summarize(latencies, elapsed, errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--requests-per-client", type=int, default=50)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    with httpx.Client() as setup:
+        headers = bench_token(setup, args.base_url)
+
+    results = {}
+    for concurrency in args.levels:
+        stats = asyncio.run(level(args, headers, concurrency))
+        results[f"{concurrency} clients"] = stats
+        print(f"📈 {concurrency:>4} clients: {stats['throughput_rps']} req/s, "
+              f"p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms, {stats['errors']} errors")
+    if args.out:
+        save_results(args.out, args.label, results)
+
+
+if __name__ == "__main__":
+    main()
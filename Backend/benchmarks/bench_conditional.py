@@ -0,0 +1,72 @@
+"""Conditional GET and compression benchmark.
+
+Fetches each cacheable endpoint in three modes and reports latency and
+bytes on the wire per request:
+
+- plain:       Accept-Encoding: identity, no validator (the old behaviour)
+- gzip:        Accept-Encoding: gzip, no validator
+- revalidate:  gzip plus If-None-Match with the last ETag (expects 304)
+
+    python -m benchmarks.bench_conditional --requests 500 --out conditional.json
+"""
+import argparse
+
+import httpx
+
+from benchmarks.common import BASE_URL, bench_token, save_results, summarize, timed
+
+ENDPOINTS = [
+    "/donor/all?limit=1000",
+    "/recipient/all?limit=1000",
+    "/stats/dashboard",
+]
+
+
+def measure(client, url, headers, requests, revalidate):
+    first = client.get(url, headers=headers)
+    first.raise_for_status()
+    if revalidate:
+        headers = {**headers, "If-None-Match": first.headers["ETag"]}
+    expected = 304 if revalidate else 200
+
+    latencies, wire_bytes, errors = [], 0, 0
+    for _ in range(requests):
+        res, elapsed_ms = timed(lambda: client.get(url, headers=headers))
+        latencies.append(elapsed_ms)
+        wire_bytes += res.num_bytes_downloaded
+        errors += res.status_code != expected
+    stats = summarize(latencies, errors=errors)
+    stats["bytes_per_request"] = round(wire_bytes / max(requests, 1))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    modes = {
+        "plain": ({"Accept-Encoding": "identity"}, False),
+        "gzip": ({"Accept-Encoding": "gzip"}, False),
+        "revalidate": ({"Accept-Encoding": "gzip"}, True),
+    }
+    results = {}
+    with httpx.Client(timeout=60) as client:
+        auth = bench_token(client, args.base_url)
+        for path in ENDPOINTS:
+            for mode, (headers, revalidate) in modes.items():
+                name = f"GET {path} [{mode}]"
+                stats = measure(client, args.base_url + path, {**auth, **headers}, args.requests, revalidate)
+                results[name] = stats
+                print(f"   {name:<44} p50 {stats['p50_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  "
+                      f"{stats['bytes_per_request']:>9} B/req  errors {stats['errors']}")
+
+    if args.out:
+        save_results(args.out, args.label, results)
+
+
+if __name__ == "__main__":
+    main()
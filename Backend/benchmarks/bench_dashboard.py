@@ -0,0 +1,60 @@
+"""Dashboard latency benchmark.
+
+Calls /stats/dashboard repeatedly and reports p50/p99 latency. Run it once
+on the old code and once on the new one, then compare the two files:
+
+    python -m benchmarks.bench_dashboard --label before --out before.json
+    python -m benchmarks.bench_dashboard --label after --out after.json
+    python -m benchmarks.bench_dashboard --compare before.json after.json
+
+--invalidate-every N logs a donation every N calls, so the run also
+measures cache misses the way a busy site would see them.
+"""
+import argparse
+from datetime import date
+
+import httpx
+
+from benchmarks.common import BASE_URL, bench_token, compare_results, save_results, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--invalidate-every", type=int, default=0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    with httpx.Client(timeout=30) as client:
+        headers = bench_token(client, args.base_url)
+        url = f"{args.base_url}/stats/dashboard"
+        for _ in range(args.warmup):
+            client.get(url, headers=headers)
+
+        latencies, errors = [], 0
+        for i in range(args.requests):
+            if args.invalidate_every and i % args.invalidate_every == 0:
+                client.post(f"{args.base_url}/history/", headers=headers, json={
+                    "hospital": "Bench Hospital", "blood_group": "O+", "date": date.today().isoformat(),
+                })
+            res, elapsed_ms = timed(lambda: client.get(url, headers=headers))
+            latencies.append(elapsed_ms)
+            errors += res.status_code != 200
+
+    results = {"GET /stats/dashboard": summarize(latencies, errors=errors)}
+    stats = results["GET /stats/dashboard"]
+    print(f"📈 {args.label}: p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms, {errors} errors")
+    if args.out:
+        save_results(args.out, args.label, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Bulk history import throughput benchmark.
+
+Streams --rows generated donation rows to POST /history/batch as CSV or
+NDJSON and reports rows per second. Rows name the donors created by
+seed_db.py (donor0@example.com ... donor{N-1}@example.com), so seed first.
+Importing other donors' rows needs an import role (see app/history_import.py),
+which is only granted in the database; the benchmark user (bench@example.com)
+is created on first login:
+
+    python seed_db.py --donors 100000
+    python -m benchmarks.bench_history_import --rows 1
+    psql "$DATABASE_URL" -c "UPDATE users SET role = 'hospital' WHERE email = 'bench@example.com'"
+    python -m benchmarks.bench_history_import --rows 500000 --donors 100000 --out import.json
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from benchmarks.common import BASE_URL, bench_token, save_results
+
+HOSPITALS = ["Mayo Hospital", "Aga Khan", "Shifa Int.", "Lady Reading", "Civil Hospital"]
+BLOOD_GROUPS = ["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"]
+BATCH_LINES = 2000
+
+
+def generate(rows, donors, format, seed):
+    rng, today = random.Random(seed), date.today()
+    if format == "csv":
+        yield b"email,hospital,blood_group,date,units\n"
+    lines = []
+    for _ in range(rows):
+        row = {
+            "email": f"donor{rng.randrange(donors)}@example.com",
+            "hospital": rng.choice(HOSPITALS),
+            "blood_group": rng.choice(BLOOD_GROUPS),
+            "date": (today - timedelta(days=rng.randint(1, 700))).isoformat(),
+            "units": 1,
+        }
+        lines.append(",".join(str(v) for v in row.values()) if format == "csv" else json.dumps(row))
+        if len(lines) == BATCH_LINES:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--donors", type=int, default=50, help="Donors in the seeded database.")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    content_type = "text/csv" if args.format == "csv" else "application/x-ndjson"
+    with httpx.Client(timeout=600) as client:
+        headers = {**bench_token(client, args.base_url), "Content-Type": content_type}
+        started = time.perf_counter()
+        res = client.post(f"{args.base_url}/history/batch", headers=headers,
+                          content=generate(args.rows, args.donors, args.format, args.seed))
+        elapsed = time.perf_counter() - started
+    res.raise_for_status()
+    body = res.json()
+
+    stats = {
+        "rows": args.rows,
+        "inserted": body["inserted"],
+        "rejected": body["rejected"],
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(args.rows / elapsed),
+    }
+    print(f"📈 {args.label}: {stats['inserted']} inserted, {stats['rejected']} rejected in "
+          f"{stats['elapsed_s']}s ({stats['rows_per_s']:,} rows/s)")
+    if args.out:
+        save_results(args.out, args.label, {f"POST /history/batch [{args.format}]": stats})
+
+
+if __name__ == "__main__":
+    main()
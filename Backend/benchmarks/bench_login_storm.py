@@ -0,0 +1,83 @@
+"""Login-storm benchmark.
+
+Measures the latency of cheap endpoints twice: once on an idle server, then
+while --storm clients log in back to back and keep the bcrypt pool
+saturated. With password work off the request workers, the probe latency
+during the storm should stay close to the idle baseline:
+
+    python -m benchmarks.bench_login_storm --storm 64 --duration 15 --out storm.json
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.common import BASE_URL, BENCH_USER, bench_token, save_results, summarize
+
+PROBE_PATHS = ["/", "/recipient/all?limit=20", "/auth/profile"]
+
+
+async def probe(client, base_url, headers, stop_at):
+    latencies = {path: [] for path in PROBE_PATHS}
+    errors = 0
+    while time.perf_counter() < stop_at:
+        for path in PROBE_PATHS:
+            started = time.perf_counter()
+            res = await client.get(base_url + path, headers=headers)
+            latencies[path].append((time.perf_counter() - started) * 1000)
+            errors += res.status_code >= 400
+        await asyncio.sleep(0.01)
+    return latencies, errors
+
+
+async def storm(client, base_url, stop_at, counter):
+    body = {"email": BENCH_USER["email"], "password": BENCH_USER["password"]}
+    while time.perf_counter() < stop_at:
+        res = await client.post(f"{base_url}/auth/login", json=body)
+        counter["logins"] += 1
+        counter["failed"] += res.status_code != 200
+
+
+async def phase(args, headers, storm_clients):
+    limits = httpx.Limits(max_connections=storm_clients + 8)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        stop_at = time.perf_counter() + args.duration
+        counter = {"logins": 0, "failed": 0}
+        tasks = [storm(client, args.base_url, stop_at, counter) for _ in range(storm_clients)]
+        (latencies, errors), *_ = await asyncio.gather(probe(client, args.base_url, headers, stop_at), *tasks)
+    results = {f"GET {path}": summarize(samples, errors=errors) for path, samples in latencies.items()}
+    if storm_clients:
+        results["POST /auth/login"] = {"logins_per_s": round(counter["logins"] / args.duration, 1),
+                                       "failed": counter["failed"]}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--storm", type=int, default=64, help="Concurrent login clients.")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per phase.")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    with httpx.Client() as setup:
+        headers = bench_token(setup, args.base_url)
+
+    print("⏳ Idle baseline...")
+    idle = asyncio.run(phase(args, headers, 0))
+    print(f"🌪️  Login storm with {args.storm} clients...")
+    loaded = asyncio.run(phase(args, headers, args.storm))
+
+    for name in idle:
+        before, during = idle[name], loaded[name]
+        print(f"   {name}: p50 {before['p50_ms']} → {during['p50_ms']} ms, "
+              f"p99 {before['p99_ms']} → {during['p99_ms']} ms")
+    print(f"   logins: {loaded['POST /auth/login']['logins_per_s']}/s")
+    if args.out:
+        save_results(args.out, args.label, {"idle": idle, "storm": loaded})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Push notification latency benchmark.
+
+Opens --listeners Server-Sent Event streams on /donor/stream as the
+benchmark user (an O+ donor in Lahore), then creates --requests compatible
+requests one at a time and measures how long each takes to reach every
+listener:
+
+    python -m benchmarks.bench_notify --listeners 200 --requests 50 --out notify.json
+
+Needs a single-worker server; the default pub/sub backend is in-process.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.common import BASE_URL, bench_token, save_results, summarize
+
+
+async def listen(client, url, received, ready):
+    async with client.stream("GET", url) as res:
+        res.raise_for_status()
+        event = None
+        async for line in res.aiter_lines():
+            if line.startswith(": connected"):
+                ready.release()
+            elif line.startswith("event:"):
+                event = line.split(":", 1)[1].strip()
+            elif line.startswith("data:") and event == "request":
+                received.append((json.loads(line[5:])["id"], time.perf_counter()))
+
+
+async def run(args):
+    with httpx.Client(timeout=30) as setup:
+        headers = bench_token(setup, args.base_url)
+    token = headers["Authorization"].split(" ", 1)[1]
+    url = f"{args.base_url}/donor/stream?token={token}"
+
+    limits = httpx.Limits(max_connections=args.listeners + 10)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+        received, ready = [], asyncio.Semaphore(0)
+        listeners = [asyncio.create_task(listen(client, url, received, ready)) for _ in range(args.listeners)]
+        for _ in range(args.listeners):
+            await ready.acquire()
+
+        latencies, missed = [], 0
+        for _ in range(args.requests):
+            received.clear()
+            sent = time.perf_counter()
+            res = await client.post(f"{args.base_url}/recipient/", headers=headers,
+                                    json={"blood_group": "A+", "city": "Lahore", "urgency": "high"})
+            request_id = res.json()["id"]
+            deadline = sent + args.timeout
+            while time.perf_counter() < deadline:
+                if sum(1 for rid, _ in received if rid == request_id) >= args.listeners:
+                    break
+                await asyncio.sleep(0.001)
+            arrivals = [at for rid, at in received if rid == request_id]
+            missed += args.listeners - len(arrivals)
+            latencies.extend((at - sent) * 1000 for at in arrivals)
+
+        for task in listeners:
+            task.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+    return summarize(latencies, errors=missed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--listeners", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=5.0, help="Seconds to wait for each delivery.")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    stats = asyncio.run(run(args))
+    print(f"📈 {args.label}: time to notify p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms, "
+          f"{stats['errors']} missed deliveries")
+    if args.out:
+        save_results(args.out, args.label, {"notify": stats})
+
+
+if __name__ == "__main__":
+    main()
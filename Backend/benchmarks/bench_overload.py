@@ -0,0 +1,72 @@
+"""Rate limiting and admission control benchmark.
+
+Run against a server started with the default limits (unlike the other
+benchmarks). Two phases, each reporting latency per response status:
+
+- login burst: --logins wrong-password logins from this one IP. All but the
+  first RATE_LIMIT_AUTH_IP should come back 429 without any bcrypt work, so
+  their latency is far below the 401s.
+- overload: --overload concurrent GET /recipient/all requests, well past
+  ADMISSION_MAX_IN_FLIGHT. The excess should get an immediate 503 while
+  the admitted requests keep their latency.
+
+    python -m benchmarks.bench_overload --logins 200 --overload 2000 --concurrency 500 --out overload.json
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.common import BASE_URL, BENCH_USER, bench_token, run_load, save_results, summarize
+
+
+async def by_status(send, total, concurrency):
+    latencies = defaultdict(list)
+
+    async def timed_send():
+        started = time.perf_counter()
+        res = await send()
+        latencies[res.status_code].append((time.perf_counter() - started) * 1000)
+        return res
+
+    await run_load(timed_send, total, concurrency)
+    return {str(code): summarize(samples) for code, samples in sorted(latencies.items())}
+
+
+async def run(args):
+    with httpx.Client(timeout=60) as setup:
+        headers = bench_token(setup, args.base_url)
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        wrong = {"email": BENCH_USER["email"], "password": "not-the-password"}
+        logins = await by_status(lambda: client.post(f"{args.base_url}/auth/login", json=wrong),
+                                 args.logins, args.concurrency)
+        overload = await by_status(lambda: client.get(f"{args.base_url}/recipient/all?limit=100", headers=headers),
+                                   args.overload, args.concurrency)
+    return {"POST /auth/login burst": logins, "GET /recipient/all overload": overload}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--overload", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for phase, statuses in results.items():
+        print(f"📊 {phase}")
+        for code, stats in statuses.items():
+            print(f"   {code}: {stats['requests']:>6} responses  p50 {stats['p50_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms")
+    if args.out:
+        save_results(args.out, args.label, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""JSON serialization microbenchmark for the list endpoints.
+
+Times turning --rows donor rows into a response body, in-process and without
+a database:
+
+- legacy:  ORM objects -> dict with strftime -> jsonable_encoder -> json.dumps
+- orjson:  column tuples -> dict -> orjson (the current /donor/all path)
+
+    python -m benchmarks.bench_serialization --rows 10000 --out serialization.json
+"""
+import argparse
+import random
+import statistics
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.models import DonorProfile, User
+from app.routers.donor import DONOR_LIST_COLUMNS, _donor_item
+from benchmarks.common import save_results
+
+# Stands in for SQLAlchemy's Row: a tuple with _asdict().
+DonorRow = namedtuple("DonorRow", [column.key for column in DONOR_LIST_COLUMNS])
+
+
+def legacy_item(p):
+    return {
+        "id": p.id,
+        "full_name": p.user.full_name,
+        "email": p.user.email,
+        "phone_number": p.user.phone_number,
+        "blood_group": p.blood_group,
+        "city": p.city,
+        "age": p.age,
+        "last_donation_date": p.last_donation_date.strftime("%Y-%m-%d") if p.last_donation_date else "Never"
+    }
+
+
+def synthetic_rows(count, rng):
+    today = date.today()
+    rows = []
+    for donor_id in range(1, count + 1):
+        last = today - timedelta(days=rng.randint(1, 500)) if rng.random() < 0.9 else None
+        rows.append(DonorRow(donor_id, f"Donor {donor_id}", f"donor{donor_id}@example.com",
+                             f"0300{rng.randint(1000000, 9999999)}", rng.choice(["A+", "O-", "B+"]),
+                             "Lahore", rng.randint(18, 60), last))
+    return rows
+
+
+def orm_objects(rows):
+    return [
+        DonorProfile(id=r.id, blood_group=r.blood_group, city=r.city, age=r.age, last_donation_date=r.last_donation_date,
+                     user=User(full_name=r.full_name, email=r.email, phone_number=r.phone_number))
+        for r in rows
+    ]
+
+
+def time_ms(fn, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows, random.Random(args.seed))
+    profiles = orm_objects(rows)
+
+    paths = {
+        "legacy": lambda: JSONResponse(jsonable_encoder([legacy_item(p) for p in profiles])).body,
+        "orjson": lambda: ORJSONResponse([_donor_item(r) for r in rows]).body,
+    }
+    results = {}
+    for name, fn in paths.items():
+        timings = time_ms(fn, args.runs)
+        results[name] = {
+            "rows": args.rows,
+            "median_ms": round(statistics.median(timings), 3),
+            "min_ms": round(min(timings), 3),
+            "body_bytes": len(fn()),
+        }
+        print(f"   {name:<8} {results[name]['median_ms']:>9} ms per {args.rows} rows "
+              f"(min {results[name]['min_ms']} ms, {results[name]['body_bytes']} bytes)")
+
+    if args.out:
+        save_results(args.out, args.label, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Startup-time benchmark.
+
+Measures (1) cold `import app.main` in a fresh interpreter and (2) time
+from launching uvicorn to the first successful GET /. Run from Backend/:
+
+    python -m benchmarks.bench_startup --runs 5 --out startup.json
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import save_results
+
+
+def cold_import_ms():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app.main"], check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def first_response_ms(port, timeout):
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=0.5).status_code == 200:
+                    return (time.perf_counter() - started) * 1000
+            except httpx.TransportError:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited before serving a request")
+            time.sleep(0.01)
+        raise TimeoutError(f"no response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    imports = [cold_import_ms() for _ in range(args.runs)]
+    firsts = [first_response_ms(args.port, args.timeout) for _ in range(args.runs)]
+    results = {
+        "cold_import": {"median_ms": round(statistics.median(imports), 1), "samples_ms": [round(v, 1) for v in imports]},
+        "first_response": {"median_ms": round(statistics.median(firsts), 1), "samples_ms": [round(v, 1) for v in firsts]},
+    }
+    print(f"📈 cold import {results['cold_import']['median_ms']} ms, "
+          f"first response {results['first_response']['median_ms']} ms (median of {args.runs})")
+    if args.out:
+        save_results(args.out, args.label, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+
+# --- SHARED BENCHMARK HELPERS ---
+# The benchmark scripts talk to a running API over HTTP (default
+# http://127.0.0.1:8000, like test_backend.py) and save their results as
+# JSON so two runs, e.g. before and after a change, can be compared.
+# Start that server with RATE_LIMIT_ENABLED=0: the load scripts log in and
+# write far faster than the per-IP and per-user limits allow (app/ratelimit.py).
+
+BASE_URL = "http://127.0.0.1:8000"
+
+BENCH_USER = {
+    "full_name": "Bench User",
+    "email": "bench@example.com",
+    "password": "bench-password-123",
+    "role": "donor",
+    "blood_group": "O+",
+    "city": "Lahore",
+}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies_ms, elapsed_s=None, errors=0):
+    result = {
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(latencies_ms), 3) if latencies_ms else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+    }
+    if elapsed_s:
+        result["throughput_rps"] = round(len(latencies_ms) / elapsed_s, 1)
+    return result
+
+
+def bench_token(client, base_url=BASE_URL, user=BENCH_USER):
+    """Log in as the benchmark user (signing it up on first use); returns auth headers."""
+    res = client.post(f"{base_url}/auth/login", json={"email": user["email"], "password": user["password"]})
+    if res.status_code != 200:
+        res = client.post(f"{base_url}/auth/signup", json=user)
+    res.raise_for_status()
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+def timed(fn):
+    started = time.perf_counter()
+    value = fn()
+    return value, (time.perf_counter() - started) * 1000
+
+
+def save_results(path, label, results):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    payload = {"label": label, "recorded_at": datetime.now().isoformat(timespec="seconds"), "results": results}
+    with open(path, "w") as fh:
+        json.dump(payload, fh, indent=2)
+    print(f"💾 Saved results to {path}")
+
+
+def compare_results(before_path, after_path, metrics=("p50_ms", "p99_ms"), threshold=None):
+    """Print each result's metrics side by side; returns how many results got
+    worse than `threshold` percent on any of them (0 without a threshold)."""
+    with open(before_path) as fh:
+        before = json.load(fh)
+    with open(after_path) as fh:
+        after = json.load(fh)
+    print(f"📊 {before['label']} → {after['label']}")
+    regressions = 0
+    for name, old in before["results"].items():
+        new = after["results"].get(name)
+        if new is None:
+            continue
+        parts, regressed = [], False
+        for metric in metrics:
+            if metric in old and metric in new:
+                change = (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+                regressed |= threshold is not None and change > threshold
+                parts.append(f"{metric} {old[metric]} → {new[metric]} ({change:+.1f}%)")
+        regressions += regressed
+        marker = "" if threshold is None else ("❌ " if regressed else "✅ ")
+        print(f"   {marker}{name}: " + ", ".join(parts))
+    return regressions
+
+
+async def run_load(send, total, concurrency):
+    """Fire `total` calls of the coroutine function `send()` from `concurrency`
+    workers. Returns (latencies_ms, elapsed_s, errors)."""
+    import asyncio
+
+    latencies, errors = [], 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                res = await send()
+                errors += res.status_code >= 400
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started, errors
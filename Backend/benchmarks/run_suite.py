@@ -0,0 +1,235 @@
+"""Benchmark and load-test suite for every API router.
+
+Starts the app under uvicorn on a local port (unless --base-url points at a
+running server), then drives each route below with concurrent async
+clients. It reports throughput and p50/p95/p99 latency per route and saves
+the results as JSON:
+
+    python seed_db.py --donors 100000 --requests 10000 --history 100000
+    python -m benchmarks.run_suite --out results/main.json --label main
+    python -m benchmarks.run_suite --compare results/main.json results/branch.json
+
+--compare exits non-zero if any route's p95 got worse than --threshold
+percent, so it can gate a CI job.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import date
+
+import httpx
+
+from benchmarks.common import BENCH_USER, bench_token, compare_results, run_load, save_results, summarize
+
+
+# --- SCENARIOS ---
+# One entry per route: (name, build) where build(ctx) returns a coroutine
+# function performing a single request. ctx holds the shared client, auth
+# headers and ids discovered during setup. Routes that use up a row per call
+# (claim, release, fulfill) have async builds that first create ctx["calls"]
+# requests, untimed. Requesters cannot claim their own requests, so claims
+# come from a second user, CLAIMER.
+
+CLAIMER = {**BENCH_USER, "full_name": "Bench Claimer", "email": "bench-claimer@example.com"}
+
+
+def _get(path, auth=True):
+    def build(ctx):
+        headers = ctx["headers"] if auth else None
+        url = ctx["base_url"] + path.format(**ctx)
+        return lambda: ctx["client"].get(url, headers=headers)
+    return build
+
+
+def _signup(ctx):
+    def send():
+        email = f"bench-{uuid.uuid4().hex}@example.com"
+        return ctx["client"].post(ctx["base_url"] + "/auth/signup", json={
+            "full_name": "Bench Signup", "email": email, "password": "bench-password-123",
+        })
+    return send
+
+
+def _login(ctx):
+    body = {"email": ctx["user"]["email"], "password": ctx["user"]["password"]}
+    return lambda: ctx["client"].post(ctx["base_url"] + "/auth/login", json=body)
+
+
+def _update_profile(ctx):
+    return lambda: ctx["client"].put(ctx["base_url"] + "/auth/profile/update", headers=ctx["headers"],
+                                     json={"city": "Lahore"})
+
+
+def _upsert_donor(ctx):
+    body = {"blood_group": "O+", "city": "Lahore", "age": 30, "last_donation_date": "2024-01-01"}
+    return lambda: ctx["client"].post(ctx["base_url"] + "/donor/", headers=ctx["headers"], json=body)
+
+
+def _create_request(ctx):
+    body = {"blood_group": "A+", "city": "Lahore", "urgency": "normal"}
+    return lambda: ctx["client"].post(ctx["base_url"] + "/recipient/", headers=ctx["headers"], json=body)
+
+
+def _import_history(ctx):
+    # Rows naming the caller need no import role.
+    lines = [f"{ctx['user']['email']},Bench Hospital,O+,{date.today().isoformat()},1"] * 10
+    body = "email,hospital,blood_group,date,units\n" + "\n".join(lines) + "\n"
+    return lambda: ctx["client"].post(ctx["base_url"] + "/history/batch", headers={
+        **ctx["headers"], "Content-Type": "text/csv",
+    }, content=body)
+
+
+async def _created_requests(ctx, then=None):
+    """Create ctx["calls"] requests as the bench user; `then` is POSTed on each as CLAIMER. Returns their ids."""
+    ids = []
+
+    async def create():
+        res = await ctx["client"].post(ctx["base_url"] + "/recipient/", headers=ctx["headers"],
+                                       json={"blood_group": "O+", "city": "Lahore", "urgency": "normal"})
+        request_id = res.json()["id"]
+        if then:
+            await ctx["client"].post(f"{ctx['base_url']}/recipient/{request_id}/{then}",
+                                     headers=ctx["claimer_headers"])
+        ids.append(request_id)
+        return res
+
+    await run_load(create, ctx["calls"], ctx["concurrency"])
+    return iter(ids)
+
+
+def _transition(action, by, prepare=None):
+    # by: "headers" (the requester) or "claimer_headers".
+    async def build(ctx):
+        ids = await _created_requests(ctx, prepare)
+        return lambda: ctx["client"].post(f"{ctx['base_url']}/recipient/{next(ids)}/{action}", headers=ctx[by])
+    return build
+
+
+def _log_history(ctx):
+    body = {"hospital": "Bench Hospital", "blood_group": "O+", "date": date.today().isoformat()}
+    return lambda: ctx["client"].post(ctx["base_url"] + "/history/", headers=ctx["headers"], json=body)
+
+
+SCENARIOS = [
+    ("GET /", _get("/", auth=False)),
+    ("POST /auth/signup", _signup),
+    ("POST /auth/login", _login),
+    ("GET /auth/profile", _get("/auth/profile")),
+    ("PUT /auth/profile/update", _update_profile),
+    ("POST /donor/", _upsert_donor),
+    ("GET /donor/all", _get("/donor/all?limit=100", auth=False)),
+    ("GET /donor/all?city", _get("/donor/all?limit=100&city=lahore&blood_group=O-", auth=False)),
+    ("POST /recipient/", _create_request),
+    ("GET /recipient/all", _get("/recipient/all?limit=100", auth=False)),
+    ("GET /recipient/me", _get("/recipient/me")),
+    ("GET /recipient/matches/{id}", _get("/recipient/matches/{request_id}")),
+    ("GET /recipient/matches", _get("/recipient/matches")),
+    ("POST /recipient/{id}/claim", _transition("claim", by="claimer_headers")),
+    ("POST /recipient/{id}/release", _transition("release", by="claimer_headers", prepare="claim")),
+    ("POST /recipient/{id}/fulfill", _transition("fulfill", by="headers")),
+    ("GET /stats/dashboard", _get("/stats/dashboard")),
+    ("GET /stats/stock", _get("/stats/stock")),
+    ("GET /stats/trend", _get("/stats/trend")),
+    ("POST /history/", _log_history),
+    ("POST /history/batch", _import_history),
+    ("GET /history/", _get("/history/")),
+    ("GET /history/summary", _get("/history/summary")),
+]
+
+
+# --- SERVER ---
+
+def start_server(port, workers):
+    # The suite drives single users far past the per-user write limits.
+    env = {**os.environ, "RATE_LIMIT_ENABLED": "0"}
+    server = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ], env=env)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=0.5).status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.terminate()
+    raise TimeoutError("server did not start within 120s")
+
+
+async def run(args, base_url):
+    with httpx.Client(timeout=60) as setup:
+        headers = bench_token(setup, base_url)
+        claimer_headers = bench_token(setup, base_url, CLAIMER)
+        # Claims need a donor profile whose group can give to the O+ requests.
+        setup.post(f"{base_url}/donor/", headers=claimer_headers,
+                   json={"blood_group": "O+", "city": "Lahore", "age": 30, "last_donation_date": "2024-01-01"})
+        setup.post(f"{base_url}/recipient/", headers=headers,
+                   json={"blood_group": "O+", "city": "Lahore", "urgency": "normal"})
+        open_requests = setup.get(f"{base_url}/recipient/all?limit=1").json()
+
+    selected = [s for s in SCENARIOS if not args.only or any(key in s[0] for key in args.only)]
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        ctx = {"client": client, "base_url": base_url, "headers": headers, "user": BENCH_USER,
+               "claimer_headers": claimer_headers,
+               "request_id": open_requests[0]["id"] if open_requests else 0,
+               "calls": min(args.warmup, args.requests) + args.requests, "concurrency": args.concurrency}
+        for name, build in selected:
+            send = build(ctx)
+            if asyncio.iscoroutine(send):
+                send = await send
+            await run_load(send, min(args.warmup, args.requests), args.concurrency)
+            latencies, elapsed, errors = await run_load(send, args.requests, args.concurrency)
+            results[name] = summarize(latencies, elapsed, errors)
+            stats = results[name]
+            print(f"   {name:<28} {stats['throughput_rps']:>9} req/s  p50 {stats['p50_ms']:>8} ms  "
+                  f"p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  errors {stats['errors']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="Use a running server instead of starting one.")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started server.")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per route.")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--only", nargs="*", help="Only routes whose name contains one of these strings.")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed p95 regression in percent.")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare_results(*args.compare, metrics=("p95_ms",), threshold=args.threshold) else 0)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        print(f"🚀 Starting app on port {args.port}...")
+        server = start_server(args.port, args.workers)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        print(f"📈 {args.requests} requests per route, {args.concurrency} concurrent clients")
+        results = asyncio.run(run(args, base_url))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.out:
+        save_results(args.out, args.label, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Per-route SQL query budgets.
+
+Runs the app in-process with the debug query counter enabled, calls each
+route once and fails if it issued more queries than its budget allows.
+A warm-up call fills the user cache first, so protected routes should not
+spend a query on the authenticated user. Run it against a seeded database
+(python seed_db.py) so the list pages hold many rows and an N+1 regression
+shows up as a blown budget:
+
+    python check_query_budget.py
+"""
+import os
+import sys
+
+os.environ["DEBUG"] = "1"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+QUERY_BUDGETS = {
+    "GET /": 0,
+    "GET /auth/profile": 0,
+    "GET /donor/all": 1,
+    "GET /donor/all?limit=1000": 1,
+    "GET /recipient/all": 1,
+    "GET /recipient/all?limit=1000": 1,
+    "GET /recipient/me": 0,
+    "GET /recipient/matches/{request_id}": 1,
+    "GET /recipient/matches": 1,
+    "GET /stats/dashboard": 1,
+    "GET /stats/stock": 1,
+    "GET /stats/trend": 1,
+    "GET /history/": 1,
+    "GET /history/summary": 1,
+}
+
+# Revalidating with the ETag just received must be answered without a query.
+CONDITIONAL_ROUTES = ["/donor/all", "/recipient/all", "/stats/dashboard"]
+
+BUDGET_USER = {
+    "full_name": "Budget Check",
+    "email": "budget-check@example.com",
+    "password": "budget-check-password",
+    "role": "donor",
+    "blood_group": "O+",
+    "city": "Lahore",
+}
+
+
+def login(client):
+    res = client.post("/auth/login", json={"email": BUDGET_USER["email"], "password": BUDGET_USER["password"]})
+    if res.status_code != 200:
+        res = client.post("/auth/signup", json=BUDGET_USER)
+    res.raise_for_status()
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+def main():
+    failures = 0
+    with TestClient(app) as client:
+        headers = login(client)
+        client.get("/auth/profile", headers=headers)
+        open_requests = client.get("/recipient/all?limit=1").json()
+        request_id = open_requests[0]["id"] if open_requests else 0
+
+        for route, budget in QUERY_BUDGETS.items():
+            method, path = route.split(" ", 1)
+            res = client.request(method, path.format(request_id=request_id), headers=headers)
+            used = int(res.headers["X-DB-Query-Count"])
+            ok = used <= budget and res.status_code < 500
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} {route}: {used} queries (budget {budget}), "
+                  f"{res.headers['X-DB-Time-Ms']} ms, HTTP {res.status_code}")
+
+        for path in CONDITIONAL_ROUTES:
+            etag = client.get(path, headers=headers).headers["ETag"]
+            res = client.get(path, headers={**headers, "If-None-Match": etag})
+            used = int(res.headers["X-DB-Query-Count"])
+            ok = used == 0 and res.status_code == 304
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} GET {path} (If-None-Match): {used} queries, HTTP {res.status_code}")
+
+    if failures:
+        print(f"\n❌ {failures} routes over their query budget.")
+        sys.exit(1)
+    print("\n🎉 All routes within their query budgets.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,10 @@
-from app.database import engine
-# Importing models ensures they are registered with SQLAlchemy before we create tables
-from app.models import Base
+from app.database import get_engine
+from app.migrations import migrate
 
 def init_db():
     print("⏳ Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    migrate(get_engine())
     print("✅ Tables created successfully!")
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
@@ -0,0 +1,28 @@
+import argparse
+
+from app.database import get_engine
+from app.migrations import MIGRATIONS, current_version, migrate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument("--target", type=int, default=None, help="Stop at this version (default: latest).")
+    parser.add_argument("--status", action="store_true", help="Only print the current and latest versions.")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    latest = MIGRATIONS[-1][0]
+    if args.status:
+        print(f"📋 Schema version {current_version(engine)} (latest {latest})")
+        return
+
+    print("⏳ Migrating database...")
+    applied = migrate(engine, target=args.target)
+    if applied:
+        print(f"✅ Applied migrations: {', '.join(str(v) for v in applied)}")
+    else:
+        print("✅ Database already up to date.")
+
+
+if __name__ == "__main__":
+    main()
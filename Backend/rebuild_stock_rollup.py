@@ -0,0 +1,19 @@
+import time
+
+from app.database import get_engine
+from app.stock import rebuild_rollup
+
+
+def main():
+    # Recompute blood_stock_rollup from donation_history, e.g. after loading
+    # history outside the API. Runs in one transaction that deletes and
+    # refills the rows, so readers see the old rollup until it commits.
+    print("⏳ Rebuilding blood stock rollup...")
+    started = time.perf_counter()
+    with get_engine().begin() as conn:
+        rows = rebuild_rollup(conn)
+    print(f"✅ Rollup rebuilt: {rows} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,80 +1,225 @@
+"""Synthetic dataset generator.
+
+Rebuilds the schema and fills it with users, donor profiles, recipient
+requests and donation history. The defaults give the small demo dataset;
+the same script scales to millions of rows for load testing:
+
+    python seed_db.py
+    python seed_db.py --donors 2000000 --requests 200000 --history 5000000 --workers 8
+
+Rows are generated in chunks by a pool of worker processes and loaded with
+COPY. Every chunk has its own RNG derived from --seed, so a given set of
+options always produces the same data regardless of --workers. All users
+share one precomputed password hash (the password is "password123").
+"""
+import argparse
+import csv
+import io
 import random
-from datetime import datetime, timedelta
-from app.database import SessionLocal, engine
-from app.models import Base, User, DonorProfile, RecipientRequest, DonationHistory
-from app.auth import hash_password
+import time
+from datetime import date, timedelta
+from multiprocessing import Pool
 
-print("🗑️  Cleaning database...")
-Base.metadata.drop_all(bind=engine)
-print("✨ Creating fresh tables...")
-Base.metadata.create_all(bind=engine)
-db = SessionLocal()
+import psycopg2
+from sqlalchemy import text
 
-print("🌱 Generating Rich Dataset...")
+from app.auth import hash_password
+from app.database import DATABASE_URL, get_engine
+from app.geo import city_coordinates
+from app.matching import next_eligible_date
+from app.migrations import migrate
+from app.models import Base
+from app.stock import rebuild_rollup
 
 BLOOD_GROUPS = ["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"]
-CITIES = ["Lahore", "Karachi", "Islamabad", "Peshawar", "Quetta", "Multan", "Faisalabad"]
+# Approximate population frequencies, for --blood-groups population.
+POPULATION_GROUP_WEIGHTS = [0.22, 0.04, 0.29, 0.04, 0.28, 0.04, 0.07, 0.02]
+CITIES = [
+    "Lahore", "Karachi", "Islamabad", "Peshawar", "Quetta", "Multan", "Faisalabad",
+    "Rawalpindi", "Gujranwala", "Sialkot", "Hyderabad", "Sargodha", "Bahawalpur", "Sukkur", "Abbottabad",
+]
 HOSPITALS = ["Mayo Hospital", "Aga Khan", "Shifa Int.", "Lady Reading", "Civil Hospital"]
 NAMES = ["Ali", "Sara", "Ahmed", "Zara", "Bilal", "Hina", "Omar", "Fatima", "Zain", "Sana"]
+URGENCIES = ["normal", "high", "critical"]
+
+CHUNK_SIZE = 50000
+TODAY = date.today()
+
+
+# --- DISTRIBUTIONS ---
+
+def city_weights(count, skew):
+    # Zipf-like: weight of the i-th city is 1 / (i + 1) ** skew; 0 is uniform.
+    return [1 / (i + 1) ** skew for i in range(count)]
+
+
+class Generator:
+    def __init__(self, opts, chunk_seed):
+        self.rng = random.Random(chunk_seed)
+        self.opts = opts
+        self.cities = CITIES[:opts["cities"]]
+        self.city_w = city_weights(len(self.cities), opts["city_skew"])
+        self.group_w = POPULATION_GROUP_WEIGHTS if opts["blood_groups"] == "population" else None
+
+    def city(self):
+        return self.rng.choices(self.cities, self.city_w)[0]
+
+    def blood_group(self):
+        return self.rng.choices(BLOOD_GROUPS, self.group_w)[0]
+
+    def days_ago(self, low, high):
+        return TODAY - timedelta(days=self.rng.randint(low, high))
+
+    def coordinates(self, city):
+        # Scatter points up to ~15 km around the city centre.
+        latitude, longitude = city_coordinates(city)
+        return (round(latitude + self.rng.uniform(-0.13, 0.13), 5),
+                round(longitude + self.rng.uniform(-0.15, 0.15), 5))
+
+
+# --- CHUNK WRITERS ---
+# Each writer returns [(table, columns, csv_buffer), ...] for the id range [start, end).
+
+def donor_rows(gen, start, end, password_hash):
+    users, profiles = io.StringIO(), io.StringIO()
+    user_csv, profile_csv = csv.writer(users), csv.writer(profiles)
+    rng = gen.rng
+    for user_id in range(start, end):
+        blood_group, city, age = gen.blood_group(), gen.city(), rng.randint(18, 60)
+        user_csv.writerow([
+            user_id, f"{rng.choice(NAMES)} {rng.choice(NAMES)}", f"donor{user_id - 1}@example.com",
+            password_hash, "donor", f"0300{rng.randint(1000000, 9999999)}", age, blood_group, city,
+        ])
+        last_donation = gen.days_ago(60, 500)
+        profile_csv.writerow([
+            user_id, user_id, blood_group, city, age, last_donation, next_eligible_date(last_donation),
+            *gen.coordinates(city),
+        ])
+    return [
+        ("users", "id, full_name, email, password, role, phone_number, age, blood_group, city", users),
+        ("donor_profiles", "id, user_id, blood_group, city, age, last_donation_date, next_eligible_date, "
+                           "latitude, longitude", profiles),
+    ]
+
+
+def request_rows(gen, start, end, users):
+    buf, rng = io.StringIO(), gen.rng
+    out = csv.writer(buf)
+    fulfilled_ratio = gen.opts["fulfilled_ratio"]
+    for request_id in range(start, end):
+        city = gen.city()
+        out.writerow([
+            request_id, rng.randint(1, users), gen.blood_group(), city, rng.choice(URGENCIES),
+            rng.random() < fulfilled_ratio, gen.days_ago(0, 5), *gen.coordinates(city),
+        ])
+    columns = "id, user_id, blood_group, city, urgency, fulfilled, created_at, latitude, longitude"
+    return [("recipient_requests", columns, buf)]
+
+
+def history_rows(gen, start, end, users):
+    buf, rng = io.StringIO(), gen.rng
+    out = csv.writer(buf)
+    for entry_id in range(start, end):
+        out.writerow([
+            entry_id, rng.randint(1, users), "donation", gen.days_ago(1, 60),
+            rng.choice(HOSPITALS), gen.blood_group(), 1,
+        ])
+    return [("donation_history", "id, user_id, entry_type, date, hospital, blood_group, quantity", buf)]
+
+
+def load_chunk(task):
+    kind, start, end, opts = task
+    # Chunk RNG depends only on the seed and the chunk, never on the worker.
+    gen = Generator(opts, f"{opts['seed']}:{kind}:{start}")
+    if kind == "donors":
+        tables = donor_rows(gen, start, end, opts["password_hash"])
+    elif kind == "requests":
+        tables = request_rows(gen, start, end, opts["donors"])
+    else:
+        tables = history_rows(gen, start, end, opts["donors"])
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        with conn, conn.cursor() as cur:
+            for table, columns, buf in tables:
+                buf.seek(0)
+                cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+    finally:
+        conn.close()
+    return kind, end - start
+
+
+def chunks(kind, total, opts):
+    return [(kind, start, min(start + CHUNK_SIZE, total + 1), opts) for start in range(1, total + 1, CHUNK_SIZE)]
+
+
+def run_phase(pool, tasks, label):
+    started, done = time.perf_counter(), 0
+    for _, rows in pool.imap_unordered(load_chunk, tasks):
+        done += rows
+    elapsed = time.perf_counter() - started
+    print(f"✅ {label}: {done} rows in {elapsed:.1f}s ({done / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+def reset_schema(engine):
+    print("🗑️  Cleaning database...")
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+    print("✨ Creating fresh tables...")
+    migrate(engine, log=lambda message: None)
+
+
+def finish(engine):
+    # Rows were inserted with explicit ids; move the sequences past them.
+    with engine.begin() as conn:
+        for table in ("users", "donor_profiles", "recipient_requests", "donation_history"):
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"
+            ))
+        # History was loaded with COPY, bypassing the API's rollup upserts.
+        rebuild_rollup(conn)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--donors", type=int, default=50, help="Users, each with a donor profile.")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--history", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cities", type=int, default=7, choices=range(1, len(CITIES) + 1), metavar="N",
+                        help=f"Use the first N cities (max {len(CITIES)}).")
+    parser.add_argument("--city-skew", type=float, default=0.0,
+                        help="Zipf exponent for city popularity; 0 = uniform, ~1 = a few big cities.")
+    parser.add_argument("--blood-groups", choices=["uniform", "population"], default="uniform")
+    parser.add_argument("--fulfilled-ratio", type=float, default=0.0,
+                        help="Share of requests created already fulfilled.")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    reset_schema(engine)
+
+    opts = {
+        "seed": args.seed,
+        "donors": args.donors,
+        "cities": args.cities,
+        "city_skew": args.city_skew,
+        "blood_groups": args.blood_groups,
+        "fulfilled_ratio": args.fulfilled_ratio,
+        "password_hash": hash_password("password123"),
+    }
+
+    print("🌱 Generating Rich Dataset...")
+    with Pool(args.workers) as pool:
+        run_phase(pool, chunks("donors", args.donors, opts), "Donors")
+        run_phase(pool, chunks("requests", args.requests, opts) + chunks("history", args.history, opts),
+                  "Requests and history")
+    finish(engine)
+    print("🎉 Dataset Generation Complete!")
+
 
-# --- 1. CREATE 50 DONORS ---
-donors = []
-for i in range(50):
-    user = User(
-        full_name=f"{random.choice(NAMES)} {random.choice(NAMES)}",
-        email=f"donor{i}@example.com",
-        # REMOVED CNIC HERE
-        password=hash_password("password123"),
-        role="donor",
-        phone_number=f"0300{random.randint(1000000, 9999999)}",
-        age=random.randint(18, 45),
-        blood_group=random.choice(BLOOD_GROUPS),
-        city=random.choice(CITIES)
-    )
-    db.add(user)
-    db.commit()
-    
-    profile = DonorProfile(
-        user_id=user.id,
-        blood_group=user.blood_group,
-        city=user.city,
-        age=user.age,
-        last_donation_date=datetime.now().date() - timedelta(days=random.randint(60, 500))
-    )
-    db.add(profile)
-    donors.append(user)
-
-db.commit()
-print("✅ Created 50 Donors.")
-
-# --- 2. REQUESTS ---
-for i in range(20):
-    requester = random.choice(donors)
-    req = RecipientRequest(
-        user_id=requester.id,
-        blood_group=random.choice(BLOOD_GROUPS),
-        city=random.choice(CITIES),
-        urgency=random.choice(["normal", "high", "critical"]),
-        fulfilled=False,
-        created_at=datetime.now() - timedelta(days=random.randint(0, 5))
-    )
-    db.add(req)
-
-db.commit()
-print("✅ Created 20 Active Requests.")
-
-# --- 3. HISTORY ---
-for i in range(30):
-    entry = DonationHistory(
-        user_id=random.choice(donors).id,
-        entry_type="donation",
-        date=datetime.now().date() - timedelta(days=random.randint(1, 60)),
-        hospital=random.choice(HOSPITALS),
-        blood_group=random.choice(BLOOD_GROUPS),
-        quantity=1
-    )
-    db.add(entry)
-
-db.commit()
-db.close()
-print("🎉 Dataset Generation Complete!")
\ No newline at end of file
+if __name__ == "__main__":
+    main()